@@ -24,6 +24,9 @@ CONFIG: Dict = {
         'focus_time': 300,
         'coverage_update_time': 30,
         'sync_time': 300,
+        # seconds to wait for the evaluator to catch up before comparing
+        # bitmaps
+        'evaluation_wait': 30,
         'timeout': '24h'
     },
     # unused now
@@ -37,6 +40,27 @@ CONFIG: Dict = {
     'evaluator': {
         'binary_root': '/d/p/justafl',
         'binary_crash_root': '/d/p/aflasan',
+        # forkserver processes replaying test cases, scale with the cores
+        # given to evaluation
+        'workers': 1,
+        # seconds between two publications of the bitmaps in live mode
+        'publish_interval': 1,
+        # queued test cases above which the evaluator only runs the ones
+        # tagged +cov and those of under-sampled fuzzers right away, 0 to
+        # disable
+        'degraded_backlog': 0,
+        # take the coverage of fuzzers whose target_root is binary_root
+        # from their fuzz_bitmap instead of replaying their queue
+        'import_bitmap': False,
+        # keep the edges of every unique input in eval/edges.store, for
+        # analyses that should not run the target again
+        'edge_store': True,
+        # per exec timeout of the forkserver in ms
+        'exec_timeout': 1000,
+        # hangs are replayed after the normal inputs with a shorter timeout
+        # (ms) and at most hang_budget seconds per round
+        'hang_timeout': 200,
+        'hang_budget': 10,
     },
     # only specify basic things
     # how to launch fuzzers with proper arguments is handled by fuzzer driver
@@ -2,17 +2,17 @@
 '''
 1. create a docker instance for each fuzzer
 '''
+import copy
 import json
 import logging
 import os
 import re
-from typing import Dict, Optional
-
-import filelock
+import threading
+from typing import Dict, Optional, Tuple
 
 from . import config as Config
 from . import evaluator
-from .datatype import Bitmap
+from .datatype import Bitmap, BitmapHeader
 
 config = Config.CONFIG
 
@@ -20,6 +20,17 @@ logger = logging.getLogger('autofz.coverage')
 
 EVALUTOR_THREAD = None
 
+MAP_SIZE: Optional[int] = None
+
+# snapshot cache, bitmaps are keyed by the sequence number in the header and
+# bug counters by the inode of the published file; both change on every
+# evaluator publication
+BITMAP_CACHE: Dict[str, Tuple[int, Bitmap]] = {}
+UNIQUE_BUGS_CACHE: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+SUMMARY_CACHE: Optional[Tuple[Tuple[int, int], Dict]] = None
+CACHE_LOCK = threading.Lock()
+CACHE_STATS = {'hit': 0, 'miss': 0}
+
 
 def parse_afl_cov_output(output):
     m_line = re.search(
@@ -51,21 +62,66 @@ def parse_afl_cov_output(output):
     return ret
 
 
+def get_map_size(output_dir) -> Optional[int]:
+    '''
+    map size recorded by the evaluator for this campaign
+    '''
+    global MAP_SIZE
+    if MAP_SIZE is not None:
+        return MAP_SIZE
+    map_size_path = os.path.join(output_dir, 'eval', 'map_size')
+    if not os.path.exists(map_size_path):
+        return None
+    with open(map_size_path, 'r') as f:
+        MAP_SIZE = int(f.read())
+    Bitmap.set_map_size(MAP_SIZE)
+    return MAP_SIZE
+
+
+def cache_hit(hit):
+    with CACHE_LOCK:
+        CACHE_STATS['hit' if hit else 'miss'] += 1
+
+
+def get_cache_stats():
+    with CACHE_LOCK:
+        return dict(CACHE_STATS)
+
+
+def bitmap_snapshot(bitmap: Bitmap) -> Bitmap:
+    '''
+    callers may modify what they get, read-only bitmaps are copied on write
+    so they can share the cached one
+    '''
+    if bitmap.bitmap.readonly:
+        return copy.copy(bitmap)
+    return copy.deepcopy(bitmap)
+
+
 def get_bitmap_fuzzer(target, fuzzer, output_dir):
     fuzzer_output_dir = os.path.join(output_dir, 'eval', fuzzer)
-    lock_path = os.path.realpath(os.path.join(output_dir, 'eval', 'lock'))
-    if not os.path.exists(lock_path): return None
+    if not get_map_size(output_dir): return None
     bitmap_path = os.path.join(fuzzer_output_dir, 'bitmap')
-    lock = filelock.FileLock(lock_path, timeout=300)
-    bitmap = None
-    with lock:
-        if not os.path.exists(bitmap_path):
-            logger.critical(f'{bitmap_path} is None')
-            return None
-        if os.path.exists(bitmap_path):
-            bitmap = Bitmap(bitmap_path=bitmap_path)
+    # NOTE: the evaluator publishes by renaming a complete file over the old
+    # one, an open file keeps pointing to the same version, no lock needed
+    if not os.path.exists(bitmap_path):
+        logger.critical(f'{bitmap_path} is None')
+        return None
+    header = BitmapHeader.read(bitmap_path)
+    with CACHE_LOCK:
+        cached = BITMAP_CACHE.get(fuzzer)
+    if header and cached and cached[0] == header.seq:
+        cache_hit(True)
+        return bitmap_snapshot(cached[1])
+    cache_hit(False)
+    # NOTE: a newer version could be published after reading the header, it
+    # is cached under the older seq and simply reloaded next time
+    bitmap = Bitmap.from_mmap(bitmap_path)
     assert bitmap
-    return bitmap
+    if header:
+        with CACHE_LOCK:
+            BITMAP_CACHE[fuzzer] = (header.seq, bitmap)
+    return bitmap_snapshot(bitmap)
 
 
 def get_coverage_global(output_dir):
@@ -82,36 +138,67 @@ def get_coverage_global(output_dir):
 
 def get_unique_bugs_fuzzer(target, fuzzer, output_dir):
     fuzzer_output_dir = os.path.join(output_dir, 'eval', fuzzer)
-    lock_path = os.path.realpath(os.path.join(output_dir, 'eval', 'lock'))
-    lock = filelock.FileLock(lock_path, timeout=300)
-    if not os.path.exists(lock_path): return None
+    if not get_map_size(output_dir): return None
     log_path = os.path.join(fuzzer_output_dir, 'crashrunner-latest.log')
     log_new_path = os.path.join(fuzzer_output_dir,
                                 'crashrunner-new-latest.json')
-    unique_bugs = 0
-    with lock:
-        if not os.path.exists(log_new_path):
-            logger.critical(f'{log_new_path} does not exist')
-            return {
-                "unique_bugs": 0,
-                "unique_bugs_ip": 0,
-                "unique_bugs_trace": 0,
-                "unique_bugs_trace3": 0
-            }
-        with open(log_new_path, 'r') as f:
-            data = json.load(f)
-            # print(data)
-            unique_bugs = data["unique_bugs"]
-            unique_bugs_ip = data["unique_bugs_ip"]
-            unique_bugs_trace = data["unique_bugs_trace"]
-            unique_bugs_trace3 = data["unique_bugs_trace3"]
-            return data
-    # should not happen
+    if not os.path.exists(log_new_path):
+        logger.critical(f'{log_new_path} does not exist')
+        return {
+            "unique_bugs": 0,
+            "unique_bugs_ip": 0,
+            "unique_bugs_trace": 0,
+            "unique_bugs_trace3": 0
+        }
+    with open(log_new_path, 'r') as f:
+        st = os.fstat(f.fileno())
+        version = (st.st_ino, st.st_mtime_ns)
+        with CACHE_LOCK:
+            cached = UNIQUE_BUGS_CACHE.get(fuzzer)
+        if cached and cached[0] == version:
+            cache_hit(True)
+            return dict(cached[1])
+        cache_hit(False)
+        data = json.load(f)
+    with CACHE_LOCK:
+        UNIQUE_BUGS_CACHE[fuzzer] = (version, data)
+    return dict(data)
+
+
+def get_summary(output_dir) -> Optional[Dict]:
+    '''
+    per fuzzer bitmap counts and bug counters published by the evaluator
+    in eval/cov.json, no bitmap is loaded
+    '''
+    global SUMMARY_CACHE
+    summary_path = os.path.join(output_dir, 'eval', 'cov.json')
+    if not os.path.exists(summary_path):
+        return None
+    with open(summary_path, 'r') as f:
+        st = os.fstat(f.fileno())
+        version = (st.st_ino, st.st_mtime_ns)
+        with CACHE_LOCK:
+            cached = SUMMARY_CACHE
+        if cached and cached[0] == version:
+            cache_hit(True)
+            return cached[1]
+        cache_hit(False)
+        data = json.load(f)
+    with CACHE_LOCK:
+        SUMMARY_CACHE = (version, data)
+    return data
+
+
+def get_summary_fuzzer(summary, fuzzer) -> Optional[Dict]:
+    if fuzzer not in summary['coverage']:
+        return None
     return {
-        "unique_bugs": 0,
-        "unique_bugs_ip": 0,
-        "unique_bugs_trace": 0,
-        "unique_bugs_trace3": 0
+        'bitmap': summary['coverage'][fuzzer],
+        'unique_bugs': {
+            key: summary[key][fuzzer]
+            for key in ('unique_bugs', 'unique_bugs_ip', 'unique_bugs_trace',
+                        'unique_bugs_trace3')
+        }
     }
 
 
@@ -245,5 +332,41 @@ def thread_run_global(target,
     return result
 
 
+def get_edge_index():
+    '''
+    per edge fuzzer membership matching the published bitmaps, shared and
+    must not be modified
+    '''
+    return evaluator.get_edge_index()
+
+
+def get_edge_store():
+    '''
+    edges of every unique input evaluated so far, keyed by md5; see
+    edgestore.EdgeStore for the queries
+    '''
+    return evaluator.get_edge_store()
+
+
+def new_epoch() -> int:
+    return evaluator.new_epoch()
+
+
+def set_priority(fuzzers):
+    evaluator.set_priority(fuzzers)
+
+
+def get_queue_depth():
+    return evaluator.get_queue_depth()
+
+
+def wait_evaluated(fuzzers, t=None, timeout=None) -> bool:
+    return evaluator.wait_evaluated(fuzzers, t, timeout)
+
+
+def get_lag():
+    return evaluator.get_lag()
+
+
 def sync():
     evaluator.sync()
@@ -1,109 +1,332 @@
 #!/usr/bin/env python3
 import logging
+import mmap
 import os
+import struct
+import threading
 import time
+from typing import Optional
 
 import numpy as np
 from bitarray import bitarray
+from bitarray.util import bits2bytes, count_or, subset, zeros
 
 logger = logging.getLogger('autofz.datatype')
 SCRIPT_PATH = os.path.dirname(os.path.realpath(__file__))
 
+# per thread scratch buffer reused by the fused bitmap operations
+_SCRATCH = threading.local()
+
+
+def scratch_bitarray(size) -> bitarray:
+    bits = getattr(_SCRATCH, 'bits', None)
+    if bits is None or len(bits) != size:
+        bits = bitarray(size, endian=Bitmap.ENDIAN)
+        _SCRATCH.bits = bits
+    return bits
+
+
+def pack_bitmap(content, virgin=False) -> bitarray:
+    '''
+    convert an unpacked bitmap (one byte per edge) into a packed bitarray
+    (one bit per edge)
+
+    content can be an AFL trace_bits, an AFL virgin_bits or an already
+    normalized 0/1 map as written by the old evaluator
+    '''
+    raw = np.frombuffer(content, dtype=np.uint8)
+    if virgin:
+        # virgin_bits uses 0xff to say "this edge was not touched"
+        hit = raw != 0xff
+    else:
+        # only count an edge as visited if it's neither 0xff nor 0x00
+        hit = (raw != 0xff) & (raw != 0x00)
+    bits = bitarray(endian=Bitmap.ENDIAN)
+    bits.frombytes(np.packbits(hit).tobytes())
+    del bits[len(raw):]
+    return bits
+
+
+def unpack_bitmap(bits: bitarray) -> np.ndarray:
+    '''
+    inverse of pack_bitmap, returns a normalized 0/1 uint8 array
+    '''
+    raw = np.frombuffer(bits.tobytes(), dtype=np.uint8)
+    return np.unpackbits(raw, count=len(bits))
+
+
+def bitmap_edges(bits: bitarray) -> np.ndarray:
+    '''
+    sorted positions of the bits set in bits, only the non zero bytes of
+    the packed bitmap are unpacked
+    '''
+    raw = np.frombuffer(bits, dtype=np.uint8)
+    nonzero = np.flatnonzero(raw)
+    byte, bit = np.nonzero(np.unpackbits(raw[nonzero]).reshape(-1, 8))
+    edges = nonzero[byte] * 8 + bit
+    return edges[edges < len(bits)]
+
+
+def edges_bitmap(edges: np.ndarray, size) -> bitarray:
+    '''
+    inverse of bitmap_edges
+    '''
+    edges = np.asarray(edges, dtype=np.int64)
+    raw = np.zeros(bits2bytes(size), dtype=np.uint8)
+    np.bitwise_or.at(raw, edges >> 3, (0x80 >> (edges & 7)).astype(np.uint8))
+    bits = bitarray(endian=Bitmap.ENDIAN)
+    bits.frombytes(raw.tobytes())
+    del bits[size:]
+    return bits
+
+
+class BitmapHeader(object):
+    '''
+    header of the on-disk bitmap, the packed bitmap follows right after it
+
+    count is the popcount of the bitmap so that count only readers don't
+    need to touch the bitmap, seq is increased by the evaluator every time
+    a new bitmap is published
+    '''
+    MAGIC = b'AFZB'
+    VERSION = 1
+    # magic, version, map size, count, seq, padding
+    STRUCT = struct.Struct('<4sIIIQ8x')
+    SIZE = STRUCT.size
+
+    def __init__(self, map_size, count, seq, version=VERSION):
+        self.version = version
+        self.map_size = map_size
+        self.count = count
+        self.seq = seq
+
+    def pack(self) -> bytes:
+        return self.STRUCT.pack(self.MAGIC, self.version, self.map_size,
+                                self.count, self.seq)
+
+    @classmethod
+    def unpack(cls, content) -> Optional['BitmapHeader']:
+        if len(content) < cls.SIZE:
+            return None
+        magic, version, map_size, count, seq = cls.STRUCT.unpack_from(content)
+        if magic != cls.MAGIC:
+            return None
+        if version != cls.VERSION:
+            logger.critical(f'unknown bitmap version {version}')
+            return None
+        return cls(map_size=map_size, count=count, seq=seq, version=version)
+
+    @classmethod
+    def read(cls, bitmap_path) -> Optional['BitmapHeader']:
+        with open(bitmap_path, 'rb') as f:
+            content = f.read(cls.SIZE)
+        return cls.unpack(content)
+
+    def toJSON(self):
+        return self.__dict__
+
+    def __repr__(self):
+        return str(self.__dict__)
+
+
+def convert_bitmap_file(src_path, dst_path=None) -> None:
+    '''
+    convert an on-disk bitmap of the old formats (one byte per edge or
+    packed without header) into the current format, in place if dst_path is
+    not given
+    '''
+    if dst_path is None:
+        dst_path = src_path
+    with open(src_path, 'rb') as f:
+        content = f.read()
+    if BitmapHeader.unpack(content):
+        if dst_path != src_path:
+            with open(dst_path, 'wb') as f:
+                f.write(content)
+        return
+    if len(content) == bits2bytes(Bitmap.BITMAP_SIZE):
+        # packed without header
+        bits = bitarray(endian=Bitmap.ENDIAN)
+        bits.frombytes(content)
+        del bits[Bitmap.BITMAP_SIZE:]
+    else:
+        bits = pack_bitmap(content)
+        del bits[Bitmap.BITMAP_SIZE:]
+    with open(dst_path, 'wb') as f:
+        Bitmap(bitmap=bits).tofile(f)
+
 
 class Bitmap(object):
+    '''
+    coverage bitmap, one bit per edge
+
+    the bitmap is packed with bitarray so that each map only takes
+    BITMAP_SIZE / 8 bytes and count() is a popcount
+    '''
     # NOTE: copy from cupid, but we actually use only use 16 bits during fuzzing (/d/p/justafl/)
-    BITMAP_SIZE = 1048576
+    DEFAULT_BITMAP_SIZE = 1048576
+    # overwritten by set_map_size once the evaluator knows the target map size
+    BITMAP_SIZE = DEFAULT_BITMAP_SIZE
+    ENDIAN = 'big'
 
     def __init__(self, bitmap=None, bitmap_path=None):
+        # popcount from the file header, only valid while read-only
+        self._count = None
         if bitmap is not None:
-            self.bitmap = bitmap
+            if isinstance(bitmap, bitarray):
+                self.bitmap = bitmap
+            else:
+                # unpacked 0/1 np.array
+                self.bitmap = pack_bitmap(bitmap)
             return
         assert bitmap_path
         self.bitmap = None
-        counter = 0
-        while os.stat(bitmap_path).st_size != Bitmap.BITMAP_SIZE:
-            time.sleep(0.1)
-            if counter > 100:
-                break
-            counter += 1
-        if counter:
-            logger.critical(f'bitmap counter: {counter}')
+        packed_size = bits2bytes(Bitmap.BITMAP_SIZE)
+        # NOTE: bitmaps are published with a rename, the file is complete
         with open(bitmap_path, 'rb') as f:
             content = f.read()
-            self.bitmap = np.array(bytearray(content), dtype='uint8')
-            # has beed normalized by quickcov
+        header = BitmapHeader.unpack(content)
+        if header:
+            self.bitmap = bitarray(endian=Bitmap.ENDIAN)
+            self.bitmap.frombytes(memoryview(content)[BitmapHeader.SIZE:])
+            del self.bitmap[header.map_size:]
+        elif len(content) == packed_size:
+            self.bitmap = bitarray(endian=Bitmap.ENDIAN)
+            self.bitmap.frombytes(content)
+            del self.bitmap[Bitmap.BITMAP_SIZE:]
+        else:
+            # old format, has beed normalized by quickcov
+            self.bitmap = pack_bitmap(content)
+            del self.bitmap[Bitmap.BITMAP_SIZE:]
         assert self
 
+    @classmethod
+    def from_mmap(cls, bitmap_path):
+        '''
+        read-only bitmap backed by a mapping of the packed file
+        nothing is copied until the bitmap is modified
+        '''
+        with open(bitmap_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size < BitmapHeader.SIZE:
+                return cls(bitmap_path=bitmap_path)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = BitmapHeader.unpack(mm[:BitmapHeader.SIZE])
+        if (header is None or header.map_size % 8 or file_size !=
+                BitmapHeader.SIZE + bits2bytes(header.map_size)):
+            # old format, do a normal read
+            mm.close()
+            return cls(bitmap_path=bitmap_path)
+        bits = bitarray(buffer=memoryview(mm)[BitmapHeader.SIZE:],
+                        endian=cls.ENDIAN)
+        bitmap = cls(bitmap=bits)
+        bitmap._count = header.count
+        return bitmap
+
+    @staticmethod
+    def set_map_size(size):
+        Bitmap.BITMAP_SIZE = size
+
     @classmethod
     def empty(cls):
-        b = bytearray([0]) * cls.BITMAP_SIZE
-        bitmap = np.array(b)
-        del b
-        return cls(bitmap=bitmap)
+        return cls(bitmap=zeros(cls.BITMAP_SIZE, endian=cls.ENDIAN))
 
     @classmethod
     def full(cls):
-        b = bytearray([1]) * cls.BITMAP_SIZE
-        bitmap = np.array(b)
-        del b
+        bitmap = bitarray(cls.BITMAP_SIZE, endian=cls.ENDIAN)
+        bitmap.setall(1)
         return cls(bitmap=bitmap)
 
     def __bool__(self):
         return self.bitmap is not None
 
-    def normalize_bitmap(self):
-        # it could be an AFL virgin_bits or an AFL trace_bits
-        # virgin_bits uses 0xff to say "this edge was not touched"
-        # trace_bits uses 0x00 to say the same
-        # so only count an edge as visited if it's neither 0xff nor 0x00
-        # more reliant than trying to detect if it's coming from virgin_bits or trace_bits
-        self.bitmap = np.array(np.where(
-            (self.bitmap != 0xff) & (self.bitmap != 0x00), 1, 0),
-                               dtype='uint8')
-
     def is_new(self, data):
         if len(self.bitmap) == 0:
             return True
         else:
-            return data.delta(self.bitmap) > 0
+            return data.delta_count(self) > 0
 
     def initialize_bitmap_if_necessary(self, size):
         if len(self.bitmap) == 0 and size > 0:
-            b = bytearray([0]) * size
-            self.bitmap = np.array(b)
-            del b
+            self.bitmap = zeros(size, endian=self.ENDIAN)
+
+    # copy on write for bitmaps backed by a read-only buffer
+    def ensure_writable(self):
+        if self.bitmap.readonly:
+            self.bitmap = self.bitmap.copy()
 
     # counts visited edges in bitmap
     def count(self):
-        # print(self.bitmap)
-        # print(np.sum(self.bitmap))
-        return int(np.sum(self.bitmap))
+        if self._count is not None and self.bitmap.readonly:
+            return self._count
+        return self.bitmap.count()
 
     # use other bitmap as baseline, what are the new branches in our bitmap?
-    def delta(self, other):
+    # the result is written into out if given, otherwise a new bitmap is made
+    def delta(self, other, out=None):
         if len(other.bitmap) > 0:
             self.initialize_bitmap_if_necessary(len(other.bitmap))
         elif len(self.bitmap) > 0:
             other.initialize_bitmap_if_necessary(len(self.bitmap))
         assert (len(self.bitmap) == len(other.bitmap))
-        delta = (self.bitmap | other.bitmap) - other.bitmap
-        return Bitmap(bitmap=delta)
+        if out is None:
+            delta = ~other.bitmap
+            delta &= self.bitmap
+            return self.__class__(bitmap=delta)
+        assert out is not other
+        out.assign(self)
+        out.difference_update(other)
+        return out
 
     def reset(self):
-        self.bitmap = np.array(bytearray())
+        self.bitmap = bitarray(endian=self.ENDIAN)
 
     # use other bitmap as baseline,, how many new branches are in our bitmap?
     def delta_count(self, other):
-        return np.sum(self.delta(other).bitmap)
+        if len(other.bitmap) == 0:
+            return self.count()
+        if len(self.bitmap) == 0:
+            return 0
+        assert (len(self.bitmap) == len(other.bitmap))
+        # |self - other| = |self | other| - |other|
+        return count_or(self.bitmap, other.bitmap) - other.bitmap.count()
 
-    # update bitmap
+    # update bitmap in place
     def update(self, other):
         if len(other.bitmap) == 0:
             return
         self.initialize_bitmap_if_necessary(len(other.bitmap))
         assert (len(self.bitmap) == len(other.bitmap))
-        u = self.bitmap | other.bitmap
-        self.bitmap = u
+        self.ensure_writable()
+        self.bitmap |= other.bitmap
+
+    # in place version of intersect
+    def intersection_update(self, other):
+        if len(other.bitmap) == 0:
+            return
+        self.initialize_bitmap_if_necessary(len(other.bitmap))
+        assert (len(self.bitmap) == len(other.bitmap))
+        self.ensure_writable()
+        self.bitmap &= other.bitmap
+
+    # in place version of delta
+    def difference_update(self, other):
+        if len(other.bitmap) == 0:
+            return
+        self.initialize_bitmap_if_necessary(len(other.bitmap))
+        assert (len(self.bitmap) == len(other.bitmap))
+        tmp = scratch_bitarray(len(other.bitmap))
+        tmp[:] = other.bitmap
+        tmp.invert()
+        self.ensure_writable()
+        self.bitmap &= tmp
+
+    # copy other into our own buffer
+    def assign(self, other):
+        if len(self.bitmap) != len(other.bitmap) or self.bitmap.readonly:
+            self.bitmap = other.bitmap.copy()
+        else:
+            self.bitmap[:] = other.bitmap
 
     def union(self, other):
         if len(other.bitmap) == 0:
@@ -111,7 +334,7 @@ class Bitmap(object):
         self.initialize_bitmap_if_necessary(len(other.bitmap))
         assert (len(self.bitmap) == len(other.bitmap))
         u = self.bitmap | other.bitmap
-        return Bitmap(u)
+        return self.__class__(bitmap=u)
 
     def intersect(self, other):
         if len(other.bitmap) == 0:
@@ -119,13 +342,30 @@ class Bitmap(object):
         self.initialize_bitmap_if_necessary(len(other.bitmap))
         assert (len(self.bitmap) == len(other.bitmap))
         u = self.bitmap & other.bitmap
-        return Bitmap(u)
+        return self.__class__(bitmap=u)
+
+    def to_array(self) -> np.ndarray:
+        return unpack_bitmap(self.bitmap)
+
+    # write header and packed bitmap
+    def tofile(self, f, seq=0):
+        header = BitmapHeader(map_size=len(self.bitmap),
+                              count=self.count(),
+                              seq=seq)
+        f.write(header.pack())
+        self.bitmap.tofile(f)
 
     def __lt__(self, other):
-        return other.delta_count(self) > 0
+        return other > self
 
     def __gt__(self, other):
-        return self.delta_count(other) > 0
+        if len(self.bitmap) == 0:
+            return False
+        if len(other.bitmap) == 0:
+            return self.bitmap.any()
+        assert (len(self.bitmap) == len(other.bitmap))
+        # any edge of ours is missing in other
+        return not subset(self.bitmap, other.bitmap)
 
     def __or__(self, other):
         return self.union(other)
@@ -139,6 +379,22 @@ class Bitmap(object):
     def __add__(self, other):
         return self.union(other)
 
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iadd__(self, other):
+        self.update(other)
+        return self
+
     def toJSON(self):
         return {'count': self.count()}
 
@@ -146,10 +402,13 @@ class Bitmap(object):
         return str({'count': self.count(), 'size': len(self.bitmap)})
 
     def __copy__(self):
-        return Bitmap(bitmap=self.bitmap)
+        bitmap = self.__class__(bitmap=self.bitmap)
+        bitmap._count = self._count
+        return bitmap
 
+    # NOTE: must not share the buffer since updates are in place
     def __deepcopy__(self, memo):
-        return Bitmap(bitmap=self.bitmap)
+        return self.__class__(bitmap=self.bitmap.copy())
 
 
 class Bugmap(object):
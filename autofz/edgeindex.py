@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+'''
+per edge fuzzer membership, one bit per fuzzer for every edge of the map,
+plus when, in which epoch and by whom each edge was first found
+
+maintained by the evaluator while merging bitmaps, so that the scheduler
+can answer intersection/union/contribution queries with a single pass over
+the index instead of combining full size bitmaps, and "new since round
+start" without keeping the bitmaps of the round start around
+'''
+import logging
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from .datatype import Bitmap, bitmap_edges, edges_bitmap
+from .mytype import Fuzzer, Fuzzers
+
+logger = logging.getLogger('autofz.edgeindex')
+
+
+def mask_dtype(num_fuzzers):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if num_fuzzers <= np.dtype(dtype).itemsize * 8:
+            return dtype
+    assert False, f'too many fuzzers for the edge index: {num_fuzzers}'
+
+
+# first_finder of edges nobody found yet
+NO_FINDER = 0xff
+
+
+class EdgeIndex(object):
+    ARRAYS = ('mask', 'first_time', 'first_epoch', 'first_finder')
+
+    def __init__(self, fuzzers: Fuzzers, size=None, start_time=None):
+        self.fuzzers: List[Fuzzer] = list(fuzzers)
+        self.dtype = mask_dtype(len(self.fuzzers))
+        self.bits: Dict[Fuzzer, int] = {
+            fuzzer: 1 << i
+            for i, fuzzer in enumerate(self.fuzzers)
+        }
+        self.all_mask = self.fuzzers_mask(self.fuzzers)
+        if size is None:
+            size = Bitmap.BITMAP_SIZE
+        self.mask = np.zeros(size, dtype=self.dtype)
+        assert len(self.fuzzers) < NO_FINDER
+        self.start_time = time.time() if start_time is None else start_time
+        # first discovery of each edge: seconds since start_time, epoch and
+        # position of the fuzzer in self.fuzzers
+        self.first_time = np.zeros(size, dtype=np.float32)
+        self.first_epoch = np.zeros(size, dtype=np.uint32)
+        self.first_finder = np.full(size, NO_FINDER, dtype=np.uint8)
+        # bumped by the scheduler at the start of each round
+        self.epoch = 0
+        # increased on every change, used to skip republishing
+        self.version = 0
+        # arrays as of the last copy and the ones changed since, a copy
+        # shares the unchanged ones with the previous copy
+        self.snapshot: Dict[str, np.ndarray] = {}
+        self.dirty = set(self.ARRAYS)
+
+    def __len__(self):
+        return len(self.mask)
+
+    def copy(self):
+        '''
+        read-only copy for the readers, only the arrays changed since the
+        previous copy are copied
+        '''
+        index = EdgeIndex.__new__(EdgeIndex)
+        index.fuzzers = self.fuzzers
+        index.dtype = self.dtype
+        index.bits = self.bits
+        index.all_mask = self.all_mask
+        index.start_time = self.start_time
+        for name in self.ARRAYS:
+            if name in self.dirty:
+                array = getattr(self, name).copy()
+                array.flags.writeable = False
+                self.snapshot[name] = array
+            setattr(index, name, self.snapshot[name])
+        self.dirty.clear()
+        index.snapshot = {}
+        index.dirty = set(self.ARRAYS)
+        index.epoch = self.epoch
+        index.version = self.version
+        return index
+
+    def has_fuzzers(self, fuzzers) -> bool:
+        return all(fuzzer in self.bits for fuzzer in fuzzers)
+
+    def fuzzers_mask(self, fuzzers):
+        m = 0
+        for fuzzer in fuzzers:
+            m |= self.bits[fuzzer]
+        return self.dtype(m)
+
+    def add(self, fuzzer, bitmap: Bitmap):
+        '''
+        mark the edges of bitmap as found by fuzzer
+        callers should only pass the new edges, it's cheaper
+        '''
+        edges = bitmap_edges(bitmap.bitmap)
+        if not len(edges):
+            return
+        self.mask[edges] |= self.dtype(self.bits[fuzzer])
+        self.dirty.add('mask')
+        self.version += 1
+
+    def discover(self, fuzzer, bitmap: Bitmap, now=None):
+        '''
+        record the edges of bitmap as first found by fuzzer in the current
+        epoch, callers must only pass edges nobody has found before; fuzzer
+        is None for edges no fuzzer found, such as those of the seeds
+        '''
+        edges = bitmap_edges(bitmap.bitmap)
+        if not len(edges):
+            return
+        if now is None:
+            now = time.time()
+        self.first_time[edges] = now - self.start_time
+        self.first_epoch[edges] = self.epoch
+        self.first_finder[edges] = (NO_FINDER if fuzzer is None else
+                                    self.fuzzers.index(fuzzer))
+        self.dirty.update(('first_time', 'first_epoch', 'first_finder'))
+        self.version += 1
+
+    def new_epoch(self) -> int:
+        self.epoch += 1
+        return self.epoch
+
+    def merge(self):
+        '''
+        after a sync every fuzzer has the edges of every other fuzzer
+        '''
+        self.mask[self.mask != 0] = self.all_mask
+        self.dirty.add('mask')
+        self.version += 1
+
+    # edges covered by any of fuzzers and their membership restricted to
+    # fuzzers; the following queries only work on those
+    def covered(self, fuzzers):
+        m = self.fuzzers_mask(fuzzers)
+        sel = self.mask & m
+        edges = np.flatnonzero(sel)
+        return m, edges, sel[edges]
+
+    def to_bitmap(self, edges) -> Bitmap:
+        return Bitmap(bitmap=edges_bitmap(edges, len(self.mask)))
+
+    def intersection(self, fuzzers) -> Bitmap:
+        if not fuzzers:
+            return Bitmap.full()
+        m, edges, sel = self.covered(fuzzers)
+        return self.to_bitmap(edges[sel == m])
+
+    def union(self, fuzzers) -> Bitmap:
+        m, edges, sel = self.covered(fuzzers)
+        return self.to_bitmap(edges)
+
+    def count(self, fuzzer) -> int:
+        bit = self.dtype(self.bits[fuzzer])
+        return int(np.count_nonzero(self.mask & bit))
+
+    def intersection_contribution(self, fuzzers) -> Dict[Fuzzer, Bitmap]:
+        '''
+        edges of each fuzzer that are not shared by all fuzzers
+        '''
+        m, edges, sel = self.covered(fuzzers)
+        contribution = {}
+        for fuzzer in fuzzers:
+            bit = self.dtype(self.bits[fuzzer])
+            found = ((sel & bit) != 0) & (sel != m)
+            contribution[fuzzer] = self.to_bitmap(edges[found])
+        return contribution
+
+    def intersection_contribution_count(self, fuzzers) -> Dict[Fuzzer, int]:
+        m, edges, sel = self.covered(fuzzers)
+        partial = sel[sel != m]
+        contribution = {}
+        for fuzzer in fuzzers:
+            bit = self.dtype(self.bits[fuzzer])
+            contribution[fuzzer] = int(np.count_nonzero(partial & bit))
+        return contribution
+
+    def distinct_contribution(self, fuzzers) -> Dict[Fuzzer, Bitmap]:
+        '''
+        edges only found by one fuzzer among fuzzers
+        '''
+        m, edges, sel = self.covered(fuzzers)
+        contribution = {}
+        for fuzzer in fuzzers:
+            bit = self.dtype(self.bits[fuzzer])
+            contribution[fuzzer] = self.to_bitmap(edges[sel == bit])
+        return contribution
+
+    def distinct_contribution_count(self, fuzzers) -> Dict[Fuzzer, int]:
+        m, edges, sel = self.covered(fuzzers)
+        contribution = {}
+        for fuzzer in fuzzers:
+            bit = self.dtype(self.bits[fuzzer])
+            contribution[fuzzer] = int(np.count_nonzero(sel == bit))
+        return contribution
+
+    def new_since(self, fuzzer, epoch) -> Bitmap:
+        '''
+        edges fuzzer has that nobody had before epoch started
+        '''
+        bit = self.dtype(self.bits[fuzzer])
+        edges = np.flatnonzero(((self.mask & bit) != 0)
+                               & (self.first_epoch >= epoch))
+        return self.to_bitmap(edges)
+
+    def new_since_count(self, fuzzers, epoch) -> Dict[Fuzzer, int]:
+        m, edges, sel = self.covered(fuzzers)
+        sel = sel[self.first_epoch[edges] >= epoch]
+        ret = {}
+        for fuzzer in fuzzers:
+            bit = self.dtype(self.bits[fuzzer])
+            ret[fuzzer] = int(np.count_nonzero(sel & bit))
+        return ret
+
+    def first_found_count(self, epoch=0) -> Dict[Fuzzer, int]:
+        '''
+        how many edges each fuzzer found first since epoch started
+        '''
+        finder = self.first_finder[(self.mask != 0)
+                                   & (self.first_epoch >= epoch)]
+        finder = finder[finder != NO_FINDER]
+        counts = np.bincount(finder, minlength=len(self.fuzzers))
+        return {
+            fuzzer: int(counts[i])
+            for i, fuzzer in enumerate(self.fuzzers)
+        }
+
+    def __repr__(self):
+        return (f'EdgeIndex({self.fuzzers}, epoch={self.epoch}, '
+                f'version={self.version})')
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+'''
+append-only store of the edges hit by each unique test case
+
+the evaluator appends a record the first time it executes an input, later
+analyses (corpus minimization, attribution, rare edges) query the store
+instead of running the target again
+
+layout: a header (magic, format version, map size) followed by records of
+    u32 length of the rest of the record
+    16 bytes md5 of the input
+    edges, sorted, as varint (LEB128) encoded deltas
+a record cut short by a crash is dropped when the store is opened again
+'''
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger('autofz.edgestore')
+
+MAGIC = b'AFZE'
+VERSION = 1
+HEADER = struct.Struct('<4sII')
+RECORD = struct.Struct('<I16s')
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    values = values.astype(np.uint64)
+    if not len(values):
+        return b''
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 5):
+        nbytes += values >= (1 << (7 * k))
+    starts = np.cumsum(nbytes) - nbytes
+    out = np.zeros(int(nbytes.sum()), dtype=np.uint8)
+    for k in range(5):
+        sel = nbytes > k
+        if not sel.any():
+            break
+        byte = (values[sel] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        more = (nbytes[sel] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[starts[sel] + k] = (byte | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def decode_varints(buf) -> np.ndarray:
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    if not len(raw):
+        return np.zeros(0, dtype=np.uint64)
+    last = (raw & 0x80) == 0
+    # which value each byte belongs to and its position in the value
+    value = np.concatenate(([0], np.cumsum(last[:-1])))
+    ends = np.flatnonzero(last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = (7 * (np.arange(len(raw)) - starts[value])).astype(np.uint64)
+    values = np.zeros(len(ends), dtype=np.uint64)
+    np.add.at(values, value, (raw & 0x7f).astype(np.uint64) << shift)
+    return values
+
+
+def encode_edges(edges: np.ndarray) -> bytes:
+    edges = np.asarray(edges, dtype=np.int64)
+    return encode_varints(np.diff(edges, prepend=0))
+
+
+def decode_edges(buf) -> np.ndarray:
+    return np.cumsum(decode_varints(buf)).astype(np.uint32)
+
+
+class EdgeStore(object):
+    def __init__(self, path, map_size, readonly=False):
+        self.path = str(path)
+        self.map_size = map_size
+        self.readonly = readonly
+        self.lock = threading.Lock()
+        # md5 digest -> (offset, length) of the encoded edges
+        self.offsets: Dict[bytes, Tuple[int, int]] = {}
+        self.mm: Optional[mmap.mmap] = None
+        if readonly:
+            self.fd = os.open(self.path, os.O_RDONLY)
+        else:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size == 0:
+            assert not readonly, f'{self.path} is empty'
+            os.write(self.fd, HEADER.pack(MAGIC, VERSION, map_size))
+        self.load()
+
+    def load(self):
+        self.remap()
+        assert self.mm is not None
+        magic, version, map_size = HEADER.unpack_from(self.mm, 0)
+        assert magic == MAGIC and version == VERSION, f'{self.path}: bad header'
+        if self.map_size is None:
+            self.map_size = map_size
+        assert map_size == self.map_size, f'{self.path}: map size {map_size}'
+        offset = HEADER.size
+        size = len(self.mm)
+        while offset + RECORD.size <= size:
+            length, digest = RECORD.unpack_from(self.mm, offset)
+            end = offset + RECORD.size + length
+            if end > size:
+                break
+            self.offsets[digest] = (offset + RECORD.size, length)
+            offset = end
+        if offset != size:
+            logger.warning(f'{self.path}: {size - offset} bytes of a '
+                           f'partial record dropped')
+            if not self.readonly:
+                self.mm.close()
+                self.mm = None
+                os.ftruncate(self.fd, offset)
+                self.remap()
+        self.end = offset
+
+    def remap(self):
+        '''
+        map everything written so far
+        '''
+        size = os.fstat(self.fd).st_size
+        if self.mm is not None and len(self.mm) == size:
+            return
+        if self.mm is not None:
+            self.mm.close()
+        self.mm = mmap.mmap(self.fd, size, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, checksum):
+        return bytes.fromhex(checksum) in self.offsets
+
+    def add(self, checksum, edges: np.ndarray) -> bool:
+        '''
+        record the edges of the input with md5 checksum, once; returns
+        whether it was new
+        '''
+        assert not self.readonly
+        digest = bytes.fromhex(checksum)
+        payload = encode_edges(edges)
+        with self.lock:
+            if digest in self.offsets:
+                return False
+            record = RECORD.pack(len(payload), digest) + payload
+            # NOTE: one write, a crash leaves at most a partial last record
+            os.pwrite(self.fd, record, self.end)
+            self.offsets[digest] = (self.end + RECORD.size, len(payload))
+            self.end += len(record)
+        return True
+
+    def _read(self, offset, length) -> np.ndarray:
+        with self.lock:
+            assert self.mm is not None
+            if offset + length > len(self.mm):
+                self.remap()
+            return decode_edges(self.mm[offset:offset + length])
+
+    def edges(self, checksum) -> Optional[np.ndarray]:
+        '''
+        sorted edges hit by the input with md5 checksum, None if unknown
+        '''
+        location = self.offsets.get(bytes.fromhex(checksum))
+        if location is None:
+            return None
+        return self._read(*location)
+
+    def items(self) -> Iterator[Tuple[str, np.ndarray]]:
+        for digest, location in list(self.offsets.items()):
+            yield digest.hex(), self._read(*location)
+
+    def inputs_hitting(self, edge) -> List[str]:
+        '''
+        checksums of the inputs that hit edge
+        '''
+        ret = []
+        for checksum, edges in self.items():
+            i = np.searchsorted(edges, edge)
+            if i < len(edges) and edges[i] == edge:
+                ret.append(checksum)
+        return ret
+
+    def hit_count(self) -> np.ndarray:
+        '''
+        number of inputs hitting each edge
+        '''
+        counts = np.zeros(self.map_size, dtype=np.uint32)
+        for _, edges in self.items():
+            counts[edges] += 1
+        return counts
+
+    def close(self):
+        with self.lock:
+            if self.mm is not None:
+                self.mm.close()
+                self.mm = None
+            os.close(self.fd)
+
+    def __repr__(self):
+        return f'EdgeStore({self.path}, {len(self)} inputs)'
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
+import argparse
+import collections
 import copy
 import ctypes
 import glob
 import hashlib
 import json
 import logging
+import math
 import os
 import pathlib
 import random
@@ -14,18 +17,24 @@ import sys
 import threading
 import time
 from enum import Enum
-from multiprocessing import Pipe, Process, Queue
+from multiprocessing import (Pipe, Process, Queue, RawValue,
+                             resource_tracker, shared_memory)
 from pathlib import Path
 from shutil import copy2
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
 
 import filelock
 import numpy as np
+from bitarray import bitarray
+from bitarray.util import bits2bytes
 from tap import Tap
 
 from . import config as Config
 from . import utils, watcher
 from .common import IS_DEBUG
+from .datatype import Bitmap, pack_bitmap
+from .edgeindex import EdgeIndex
+from .edgestore import EdgeStore
 from .mytype import Fuzzer, Fuzzers, FuzzerType, SeedType
 
 config = Config.CONFIG
@@ -46,6 +55,14 @@ class ArgsParser(Tap):
     mode: str
     input: str
     input_only: bool
+    workers: int
+    publish_interval: float
+    degraded_backlog: int
+    import_bitmap: bool
+    edge_store: bool
+    exec_timeout: int
+    hang_timeout: int
+    hang_budget: int
 
     def configure(self):
         self.add_argument("-o",
@@ -78,8 +95,28 @@ class ArgsParser(Tap):
             "--sleep",
             type=int,
             help=
-            "In --live mode, # of seconds to sleep between checking for new queue files",
+            "In --live mode, # of seconds to wait for new queue files before scanning for new fuzzer directories",
             default=10)
+        self.add_argument(
+            "--publish-interval",
+            type=float,
+            help="In --live mode, # of seconds between two publications of bitmaps",
+            default=config['evaluator'].get('publish_interval', 1))
+        self.add_argument(
+            "--degraded-backlog",
+            type=int,
+            help="# of queued test cases above which only new coverage and under-sampled fuzzers are evaluated right away, 0 to disable",
+            default=config['evaluator'].get('degraded_backlog', 0))
+        self.add_argument(
+            "--import-bitmap",
+            action='store_true',
+            help="Take the coverage of fuzzers fuzzing the evaluator binary from their fuzz_bitmap instead of replaying their queue",
+            default=config['evaluator'].get('import_bitmap', False))
+        self.add_argument(
+            "--edge-store",
+            action=argparse.BooleanOptionalAction,
+            help="Record the edges of every unique test case in eval/edges.store",
+            default=config['evaluator'].get('edge_store', True))
         self.add_argument("-T",
                           "--timeout",
                           type=str,
@@ -99,6 +136,26 @@ class ArgsParser(Tap):
                           help="Only evalaute seeds",
                           action="store_true",
                           default=False)
+        self.add_argument(
+            "--workers",
+            type=int,
+            help="# of forkserver processes replaying test cases in parallel",
+            default=config['evaluator'].get('workers', 1))
+        self.add_argument("--exec-timeout",
+                          type=int,
+                          help="per exec timeout of the forkserver in ms",
+                          default=config['evaluator'].get(
+                              'exec_timeout', 1000))
+        self.add_argument("--hang-timeout",
+                          type=int,
+                          help="per exec timeout in ms when replaying hangs",
+                          default=config['evaluator'].get(
+                              'hang_timeout', 200))
+        self.add_argument(
+            "--hang-budget",
+            type=int,
+            help="# of seconds spent on hangs after each round of test cases",
+            default=config['evaluator'].get('hang_budget', 10))
 
 
 # random path to allow multiple exeuction of autofz
@@ -123,10 +180,22 @@ INDEX_UNIQUE_BUG_IP = {}
 INDEX_UNIQUE_BUG_TRACE = {}
 INDEX_UNIQUE_BUG_TRACE3 = {}
 
-EXECUTOR = {}
+EXECUTOR: 'AFLForkserverPool'
 
 FUZZER_BITMAP = {}
 
+# per edge membership of FUZZER_BITMAP, the published copy is what the
+# scheduler sees next to the published bitmaps
+EDGE_INDEX: Optional[EdgeIndex] = None
+EDGE_INDEX_PUBLISHED: Optional[EdgeIndex] = None
+
+# edges of every unique input evaluated so far, None if disabled
+EDGE_STORE: Optional[EdgeStore] = None
+
+# sequence number and count of the last published bitmap
+BITMAP_SEQ: Dict[Fuzzer, int] = {}
+BITMAP_PUBLISHED_COUNT: Dict[Fuzzer, int] = {}
+
 logID = 0
 LAST = None
 
@@ -152,102 +221,48 @@ def json_dumper(obj):
         return obj.__dict__
 
 
-class AFLBitmap:
-    BITMAP_SIZE = 1048576
-
+class AFLBitmap(Bitmap):
     def __init__(self, bitmap=None):
-        self.bitmap = np.array(bytearray())
+        super().__init__(bitmap=bitarray(endian=Bitmap.ENDIAN))
         if bitmap is not None:
-            if isinstance(bitmap, np.ndarray):
-                # bitmap is already a converted np.array, leave it as it is
+            if isinstance(bitmap, bitarray):
+                # already packed
+                self.bitmap = bitmap
+            elif isinstance(bitmap, np.ndarray):
+                # bitmap is already a converted np.array
                 assert (np.sum(np.where(bitmap > 1, 1, 0)) == 0
                         )  # check if it looks like a converted array
-                self.bitmap = np.array(bitmap, copy=True)
+                self.bitmap = pack_bitmap(bitmap)
             else:
-                # bitmap was delivered as an actual AFL bitmap, convert to np.array
-                self.bitmap = np.array(bytearray(bitmap), dtype='uint8')
-                self.normalize_bitmap()
-
-    @classmethod
-    def empty(cls):
-        b = bytearray([0]) * cls.BITMAP_SIZE
-        bitmap = np.array(b)
-        del b
-        return cls(bitmap=bitmap)
-
-    def normalize_bitmap(self):
-        # it could be an AFL virgin_bits or an AFL trace_bits
-        # virgin_bits uses 0xff to say "this edge was not touched"
-        # trace_bits uses 0x00 to say the same
-        # so only count an edge as visited if it's neither 0xff nor 0x00
-        # more reliant than trying to detect if it's coming from virgin_bits or trace_bits
-
-        # NOTE: virgin_bits here
-        self.bitmap = np.array(np.where((self.bitmap != 0xff), 1, 0),
-                               dtype='uint8')
-
-    def is_new(self, data):
-        if len(self.bitmap) == 0:
-            return True
-        else:
-            return data.delta(self.bitmap) > 0
-
-    def initialize_bitmap_if_necessary(self, size):
-        if len(self.bitmap) == 0 and size > 0:
-            b = bytearray([0]) * size
-            self.bitmap = np.array(b)
-            del b
-
-    # counts visited edges in bitmap
-    def count(self):
-        return np.sum(self.bitmap)
-
-    # use other bitmap as baseline, what are the new branches in our bitmap?
-    def delta(self, other):
-        if len(other.bitmap) > 0:
-            self.initialize_bitmap_if_necessary(len(other.bitmap))
-        elif len(self.bitmap) > 0:
-            other.initialize_bitmap_if_necessary(len(self.bitmap))
-        assert (len(self.bitmap) == len(other.bitmap))
-        delta = (self.bitmap | other.bitmap) - other.bitmap
-        return AFLBitmap(delta)
-
-    def reset(self):
-        self.bitmap = np.array(bytearray())
+                # bitmap was delivered as an actual AFL bitmap
+                # NOTE: virgin_bits here
+                self.bitmap = pack_bitmap(bitmap, virgin=True)
 
-    # use other bitmap as baseline,, how many new branches are in our bitmap?
-    def delta_count(self, other):
-        return np.sum(self.delta(other).bitmap)
+    def __repr__(self):
+        return str(self.bitmap)
 
-    # update bitmap
-    def update(self, other):
-        if len(other.bitmap) == 0:
-            return
-        self.initialize_bitmap_if_necessary(len(other.bitmap))
-        assert (len(self.bitmap) == len(other.bitmap))
-        u = self.bitmap | other.bitmap
-        self.bitmap = u
 
-    def union(self, other):
-        if len(other.bitmap) == 0:
-            return
-        self.initialize_bitmap_if_necessary(len(other.bitmap))
-        assert (len(self.bitmap) == len(other.bitmap))
-        u = self.bitmap | other.bitmap
-        return AFLBitmap(u)
-
-    def __or__(self, other):
-        return self.union(other)
+def new_input_file_path() -> str:
+    while True:
+        path = '/dev/shm/quickcov_input_%d' % random.randint(
+            1111111111, 9999999999)
+        if not os.path.isfile(path):
+            return path
 
-    def __add__(self, other):
-        return self.union(other)
 
-    def __repr__(self):
-        return str(self.bitmap)
+# shmctl command removing a System V shared memory segment
+IPC_RMID = 0
 
 
 class AFLForkserverExecuter(object):
-    def __init__(self, binary, arguments):
+    # inputs kept in execution_cache, the least recently used go first
+    EXECUTION_CACHE_SIZE = 16384
+
+    def __init__(self,
+                 binary,
+                 arguments,
+                 exec_timeout=None,
+                 input_file_path=None):
         script_path = os.path.dirname(os.path.realpath(__file__))
 
         # if not check_afl():
@@ -263,12 +278,9 @@ class AFLForkserverExecuter(object):
         self.script_path = os.path.abspath(
             os.path.dirname(os.path.realpath(__file__)))
 
-        self.input_file_path = None
-        while self.input_file_path == None or os.path.isfile(
-                self.input_file_path):
-            self.randID = random.randint(1111111111, 9999999999)
-            self.input_file_path = "/dev/shm/quickcov_input_%d" % (self.randID)
-        assert self.input_file_path
+        if input_file_path is None:
+            input_file_path = new_input_file_path()
+        self.input_file_path = input_file_path
 
         if '@@' in self.arguments:
             self.arguments[self.arguments.index('@@')] = self.input_file_path
@@ -341,12 +353,19 @@ class AFLForkserverExecuter(object):
         self._reset.restype = None
         self._reset.argtypes = None
 
+        # u32 exec_tmout, per exec timeout of run_target in ms
+        self.exec_tmout = ctypes.c_uint32.in_dll(self.aflforkserverlib,
+                                                 'exec_tmout')
+
         # set up aflforkserver
         #(ctypes.c_char * len(self.input_file_path.encode('ascii')))(*self.input_file_path.encode('ascii'))
         # normally .cur_input
         self.input_file_path_c = (self.input_file_path +
                                   "\x00").encode('ascii')
         self.setup(self.input_file_path_c, int(False))
+        if exec_timeout is not None:
+            self.exec_tmout.value = exec_timeout
+        self.exec_timeout = self.exec_tmout.value
         execve_arguments = [s.encode('ascii') for s in self.arguments] + [
             None
         ]  # execve needs this format [param1, param2, NULL]
@@ -360,13 +379,68 @@ class AFLForkserverExecuter(object):
         if exec_failed > 0:
             print("forkserver error")
             raise Exception("AFL Forkserver error")
+        self.release_shm()
 
         self.has_get_coverage = True
         self.new_input = False
+        # inputs are read here and handed to write_to_testcase, grows on
+        # demand
+        self.input_buffer = bytearray(64 * 1024)
+        self.input_buffer_c = (ctypes.c_char * len(self.input_buffer)
+                               ).from_buffer(self.input_buffer)
+        # coverage of the inputs executed on behalf of each fuzzer, packed
+        # rows of a shared memory segment the parent reads in place
+        self.coverage_shm: Optional[shared_memory.SharedMemory] = None
+        self.fuzzer_coverage: Dict[Fuzzer, np.ndarray] = {}
+        # increased whenever the coverage of any fuzzer grows
+        self.coverage_version = 0
+        # content checksum -> (bytes hit, bits set in them, crashed); the
+        # pool sends the same content to the same executer, so an input
+        # synced to several fuzzers in a short time only runs once
+        self.execution_cache: collections.OrderedDict[str, Tuple[
+            np.ndarray, np.ndarray, bool]] = collections.OrderedDict()
+        # edges hit by the last input, None if it came from the cache
+        self.last_edges: Optional[np.ndarray] = None
+        # inputs of the current batch done so far, shared with the parent to
+        # tell a long batch from a wedged one
+        self.progress = None
+
+    def release_shm(self):
+        '''
+        the library only removes its trace bits segment atexit, which a
+        killed worker never runs; marked for removal now, the segment goes
+        away with the last process attached to it, the forkserver included
+        '''
+        libc = ctypes.CDLL(None)
+        libc.getenv.restype = ctypes.c_char_p
+        libc.getenv.argtypes = (ctypes.c_char_p, )
+        shm_id = libc.getenv(b'__AFL_SHM_ID')
+        if shm_id is None:
+            return
+        libc.shmctl.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_void_p)
+        if libc.shmctl(int(shm_id), IPC_RMID, None) != 0:
+            logger.warning(f'cannot remove shm {shm_id}')
+
+    def read_input(self, f) -> int:
+        '''
+        read f into the reusable input buffer, returns its length
+        '''
+        with open(f, 'rb') as fd:
+            size = os.fstat(fd.fileno()).st_size
+            if size > len(self.input_buffer):
+                self.input_buffer = bytearray(
+                    max(size, 2 * len(self.input_buffer)))
+                self.input_buffer_c = (ctypes.c_char *
+                                       len(self.input_buffer)).from_buffer(
+                                           self.input_buffer)
+            return fd.readinto(memoryview(self.input_buffer)[:size])
 
     def execute(self, f):
         assert self.input_file_path
-        copy2(f, self.input_file_path)
+        # NOTE: let the forkserver write the test case, no copy2 of the file
+        # and its metadata for every input
+        size = self.read_input(f)
+        self.write_to_testcase(self.input_buffer_c, size)
         hasCrashed = False
         hasExited = False
         hasCrashed = (self.run_target(self.arguments_c) == 2)
@@ -383,6 +457,102 @@ class AFLForkserverExecuter(object):
         cov = AFLBitmap(self._get_bitmap().contents)
         return cov
 
+    # NOTE: one executer serves many fuzzers, so the virgin bits are reset
+    # to get the coverage of this input only
+    def run_fuzzer(self, fuzzer, f, checksum=None) -> Tuple[bool, bool]:
+        '''
+        returns whether the input crashed and whether it added coverage to
+        fuzzer
+        '''
+        cached = None
+        if checksum is not None:
+            cached = self.execution_cache.get(checksum)
+            if cached is not None:
+                self.execution_cache.move_to_end(checksum)
+        if cached is None:
+            self._reset()
+            hasCrashed = self.execute(f)
+            virgin = np.frombuffer(self._get_bitmap().contents, dtype=np.uint8)
+            edges = np.flatnonzero(virgin != 0xff).astype(np.uint32)
+            # edges are sorted, combine the bits falling into the same byte
+            index, start = np.unique(edges >> 3, return_index=True)
+            bits = (0x80 >> (edges & 7)).astype(np.uint8)
+            if len(edges):
+                bits = np.bitwise_or.reduceat(bits, start)
+            cached = (index.astype(np.uint32), bits, hasCrashed)
+            if checksum is not None:
+                self.execution_cache[checksum] = cached
+                if len(self.execution_cache) > self.EXECUTION_CACHE_SIZE:
+                    self.execution_cache.popitem(last=False)
+            self.last_edges = edges
+        else:
+            self.last_edges = None
+        index, bits, hasCrashed = cached
+        new_coverage = False
+        if len(index):
+            row = self.fuzzer_coverage[fuzzer]
+            old = row[index]
+            if np.any((old & bits) != bits):
+                row[index] = old | bits
+                # NOTE: after the bits, readers check the version first
+                self.fuzzer_version[self.fuzzer_slot[fuzzer]] += 1
+                self.coverage_version += 1
+                new_coverage = True
+        return hasCrashed, new_coverage
+
+    def execute_batch(self, batch, exec_timeout=None, edges=False):
+        '''
+        run (fuzzer, f, checksum) of batch, one message for many inputs,
+        with exec_timeout (ms) instead of the default if given
+
+        with edges, also returns the sorted edges of every input executed
+        for the first time, None for the ones answered from the cache
+        '''
+        crashed = []
+        new_coverage = []
+        batch_edges: List[Optional[np.ndarray]] = []
+        if exec_timeout is not None:
+            self.exec_tmout.value = exec_timeout
+        try:
+            for fuzzer, f, checksum in batch:
+                c, n = self.run_fuzzer(fuzzer, f, checksum)
+                crashed.append(c)
+                new_coverage.append(n)
+                if edges:
+                    batch_edges.append(self.last_edges)
+                if self.progress is not None:
+                    self.progress.value += 1
+        finally:
+            self.exec_tmout.value = self.exec_timeout
+        ret = {
+            'crashed': crashed,
+            'new_coverage': new_coverage,
+            'version': self.coverage_version
+        }
+        if edges:
+            ret['edges'] = batch_edges
+        return ret
+
+    def attach_coverage(self, name, fuzzers):
+        '''
+        the segment starts with a version per fuzzer, increased whenever its
+        coverage grows, followed by the packed coverage of each fuzzer
+        '''
+        self.coverage_shm = shared_memory.SharedMemory(name=name)
+        self.fuzzer_slot = {fuzzer: i for i, fuzzer in enumerate(fuzzers)}
+        self.fuzzer_version = np.ndarray(len(fuzzers),
+                                         dtype=np.uint64,
+                                         buffer=self.coverage_shm.buf)
+        rows = self.fuzzer_version.nbytes
+        row_size = bits2bytes(self.MAP_SIZE)
+        self.fuzzer_coverage = {
+            fuzzer: np.ndarray(row_size,
+                               dtype=np.uint8,
+                               buffer=self.coverage_shm.buf,
+                               offset=rows + i * row_size)
+            for i, fuzzer in enumerate(fuzzers)
+        }
+
     def reset(self):
         self._reset()
         self.coverage.reset()
@@ -407,20 +577,68 @@ class AFLForkserverTask(Enum):
     RESET = 4
     CLEANUP = 5
     GET_BITMAP = 6
+    GET_MAP_SIZE = 7
+    ATTACH_COVERAGE = 9
+    EXECUTE_BATCH = 10
+
+
+class ForkserverError(Exception):
+    '''
+    a worker died or stopped answering, it has been restarted and the
+    request is lost
+    '''
+    # for a batch, inputs done before the one the worker got stuck on or
+    # died with, None if unknown
+    done: Optional[int] = None
+
+
+class ForkserverTimeout(ForkserverError):
+    pass
+
+
+class ForkserverDied(ForkserverError):
+    pass
 
 
 class AFLForkserverProcess(object):
-    def __init__(self, binary, binary_arguments):
+    # seconds to wait for the reply to anything but executions, starting
+    # the forkserver included
+    REPLY_TIMEOUT = 60
+    # an execution may take up to TIMEOUT_MULT times the exec timeout plus
+    # PROGRESS_SLACK seconds before the worker is considered wedged
+    TIMEOUT_MULT = 2
+    PROGRESS_SLACK = 1
+
+    def __init__(self, binary, binary_arguments, exec_timeout=1000):
         self.binary = binary
         self.binary_arguments = binary_arguments
+        self.exec_timeout = exec_timeout
         self.running = True
         self.queue = Queue()
+        # (name, fuzzers) of the attached coverage segment, attached again
+        # after a restart
+        self.coverage: Optional[Tuple[str, List[Fuzzer]]] = None
+        self.restarts = 0
+        self.spawn()
+
+    def spawn(self):
+        # NOTE: chosen here, a killed worker can't remove it
+        self.input_file_path = new_input_file_path()
         self.parent, self.child = Pipe()
+        # see AFLForkserverExecuter.progress
+        self.progress = RawValue(ctypes.c_uint64, 0)
         self.p = Process(target=self.process_loop, daemon=True)
         self.p.start()
+        # NOTE: only the worker keeps its end, so that its death is seen as
+        # EOF, and workers forked later don't hold it open
+        self.child.close()
 
     def process_loop(self):
-        self.afl = AFLForkserverExecuter(self.binary, self.binary_arguments)
+        self.afl = AFLForkserverExecuter(self.binary,
+                                         list(self.binary_arguments),
+                                         self.exec_timeout,
+                                         self.input_file_path)
+        self.afl.progress = self.progress
         while self.running:
             if self.child.poll(timeout=1):
                 (task, args) = self.child.recv()
@@ -433,6 +651,12 @@ class AFLForkserverProcess(object):
                 self.child.send(self.afl.get_coverage(*args))
             elif task == AFLForkserverTask.GET_BITMAP:
                 self.child.send(self.afl.get_bitmap(*args))
+            elif task == AFLForkserverTask.GET_MAP_SIZE:
+                self.child.send(self.afl.MAP_SIZE)
+            elif task == AFLForkserverTask.EXECUTE_BATCH:
+                self.child.send(self.afl.execute_batch(*args))
+            elif task == AFLForkserverTask.ATTACH_COVERAGE:
+                self.child.send(self.afl.attach_coverage(*args))
             elif task == AFLForkserverTask.RESET:
                 self.child.send(self.afl.reset())
             elif task == AFLForkserverTask.SET_CORE:
@@ -447,46 +671,150 @@ class AFLForkserverProcess(object):
                 assert (False)  # should never reach this
 
     def execute(self, f):
-        self.parent.send((AFLForkserverTask.EXECUTE, [f]))
+        self._parent_send((AFLForkserverTask.EXECUTE, [f]))
         return self._parent_recv()
 
     def get_coverage(self):
-        self.parent.send((AFLForkserverTask.GET_COVERAGE, []))
+        self._parent_send((AFLForkserverTask.GET_COVERAGE, []))
         return self._parent_recv()
 
     def get_bitmap(self):
-        self.parent.send((AFLForkserverTask.GET_BITMAP, []))
+        self._parent_send((AFLForkserverTask.GET_BITMAP, []))
+        return self._parent_recv()
+
+    def get_map_size(self):
+        self._parent_send((AFLForkserverTask.GET_MAP_SIZE, []))
+        return self._parent_recv()
+
+    def progress_deadline(self, exec_timeout=None) -> float:
+        '''
+        seconds a batch may stay on the same input
+        '''
+        if exec_timeout is None:
+            exec_timeout = self.exec_timeout
+        return exec_timeout * self.TIMEOUT_MULT / 1000 + self.PROGRESS_SLACK
+
+    def execute_batch(self, batch, exec_timeout=None, edges=False):
+        '''
+        waits as long as the worker gets through the inputs, a worker stuck
+        on one of them is restarted after about one exec timeout and the
+        error tells how many inputs were done before it
+        '''
+        self.progress.value = 0
+        self._parent_send(
+            (AFLForkserverTask.EXECUTE_BATCH, [batch, exec_timeout, edges]))
+        # NOTE: a restart replaces self.progress
+        progress = self.progress
+        deadline = self.progress_deadline(exec_timeout)
+        try:
+            done = 0
+            while not self.parent.poll(timeout=deadline):
+                if progress.value == done:
+                    logger.warning(f'restart forkserver {self.p.pid}, stuck '
+                                   f'on input {done} of {len(batch)}')
+                    self.restart_forkserver()
+                    raise ForkserverTimeout(
+                        f'Forkserver no progress in {deadline}s')
+                done = progress.value
+            return self._parent_recv(0)
+        except ForkserverError as e:
+            e.done = progress.value
+            raise
+
+    def attach_coverage(self, name, fuzzers):
+        self.coverage = (name, list(fuzzers))
+        self._parent_send((AFLForkserverTask.ATTACH_COVERAGE, [name, fuzzers]))
         return self._parent_recv()
 
     def reset(self):
-        self.parent.send((AFLForkserverTask.RESET, []))
+        self._parent_send((AFLForkserverTask.RESET, []))
         return self._parent_recv()
 
     def set_core(self, core):
-        self.parent.send((AFLForkserverTask.SET_CORE, [core]))
+        self._parent_send((AFLForkserverTask.SET_CORE, [core]))
 
     def cleanup(self):
+        # NOTE: no restart of a dead worker here
         try:
-            self.parent.send((AFLForkserverTask.CLEANUP, []))
-            self._parent_recv()
+            if self.is_alive():
+                self.parent.send((AFLForkserverTask.CLEANUP, []))
+                if self.parent.poll(timeout=self.REPLY_TIMEOUT):
+                    self.parent.recv()
             self.parent.close()
         except (EOFError, OSError):
             pass
+        self.remove_input()
         return
 
+    def is_alive(self) -> bool:
+        return self.p.is_alive()
+
+    def remove_input(self):
+        '''
+        the input file of a dead worker, it only removes it on cleanup
+        '''
+        try:
+            os.remove(self.input_file_path)
+        except FileNotFoundError:
+            pass
+
     def restart_forkserver(self):
-        self.running = False
-        self.p = Process(target=self.process_loop, daemon=True)
-        self.p.start()
+        '''
+        replace a dead or wedged worker by a fresh one with a new pipe; the
+        coverage lives in the shared memory segment of the parent, the new
+        worker attaches to the same segment and nothing accumulated so far is
+        lost
+        '''
+        self.restarts += 1
+        self.p.kill()
+        self.p.join()
+        self.parent.close()
+        self.remove_input()
+        self.spawn()
+        if self.coverage is None:
+            return
+        try:
+            self.parent.send(
+                (AFLForkserverTask.ATTACH_COVERAGE, list(self.coverage)))
+            if not self.parent.poll(timeout=self.REPLY_TIMEOUT):
+                raise ForkserverTimeout('Forkserver restart timeout')
+            self.parent.recv()
+        except (EOFError, OSError) as e:
+            raise ForkserverDied(f'Forkserver died on restart: {e}')
+        except ForkserverError:
+            # NOTE: a late reply would be taken for the next one, the next
+            # request restarts it again
+            self.p.kill()
+            raise
+
+    def _parent_send(self, msg):
+        if not self.is_alive():
+            logger.warning(f'restart forkserver {self.p.pid}, '
+                           f'exit code {self.p.exitcode}')
+            self.restart_forkserver()
+        try:
+            self.parent.send(msg)
+        except OSError as e:
+            self.restart_forkserver()
+            raise ForkserverDied(f'Forkserver send failed: {e}')
 
     # recv with timeout
-    def _parent_recv(self):
-        if self.parent.poll(timeout=1000):
-            return self.parent.recv()
+    def _parent_recv(self, timeout=None):
+        if timeout is None:
+            timeout = self.REPLY_TIMEOUT
+        if self.parent.poll(timeout=timeout):
+            try:
+                return self.parent.recv()
+            except (EOFError, OSError):
+                logger.warning(f'restart forkserver {self.p.pid}, died '
+                               f'with exit code {self.p.exitcode}')
+                self.restart_forkserver()
+                raise ForkserverDied('Forkserver died')
         else:
-            print('restart Forkserver because of timeout')
+            logger.warning(
+                f'restart forkserver {self.p.pid}, no reply in {timeout}s')
             self.restart_forkserver()
-            raise Exception("Forserver poll timeout")
+            raise ForkserverTimeout(f'Forkserver poll timeout {timeout}s')
 
     def __del__(self):
         self.cleanup()
@@ -495,6 +823,266 @@ class AFLForkserverProcess(object):
         self.p.kill()
 
 
+class AFLForkserverPool(object):
+    '''
+    a set of forkserver processes shared by all fuzzers
+
+    test cases are sharded by content, the same input always goes to the
+    same worker, which runs it once and credits its coverage to every fuzzer
+    that has it; the bitmap of a fuzzer is the union over all workers
+
+    each worker writes the packed coverage of every fuzzer into its own
+    shared memory segment, reading a bitmap needs no message to the worker
+
+    a dead or wedged worker is respawned by the request that finds it, or by
+    the supervisor thread if it dies while idle; its segment is kept, so the
+    coverage accumulated so far survives the respawn
+
+    with an edge_store, the edges of every input run for the first time are
+    sent back with the batch and appended to the store
+    '''
+    # inputs sent to a worker in one message
+    BATCH_SIZE = 256
+    # seconds between two checks of the supervisor
+    SUPERVISE_INTERVAL = 10
+
+    def __init__(self,
+                 binary,
+                 binary_arguments,
+                 fuzzers,
+                 workers=1,
+                 exec_timeout=1000):
+        assert workers > 0
+        # NOTE: a worker forked before the resource tracker runs starts its
+        # own, which unlinks the coverage segments when the worker dies
+        resource_tracker.ensure_running()
+        self.workers = [
+            AFLForkserverProcess(binary, list(binary_arguments), exec_timeout)
+            for _ in range(workers)
+        ]
+        # a worker talks through a single pipe, one request at a time
+        self.locks = [threading.Lock() for _ in self.workers]
+        # coverage version reported by each worker with its last batch
+        self.versions = [0 for _ in self.workers]
+        self.fuzzers: List[Fuzzer] = list(fuzzers)
+        self.map_size = self.get_map_size()
+        self.row_size = bits2bytes(self.map_size)
+        # layout: see AFLForkserverExecuter.attach_coverage
+        self.rows = len(self.fuzzers) * np.dtype(np.uint64).itemsize
+        self.shms: List[shared_memory.SharedMemory] = []
+        self.fuzzer_versions: List[np.ndarray] = []
+        for i, worker in enumerate(self.workers):
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=self.rows +
+                                             len(self.fuzzers) * self.row_size)
+            self.shms.append(shm)
+            self.fuzzer_versions.append(
+                np.ndarray(len(self.fuzzers), dtype=np.uint64,
+                           buffer=shm.buf))
+            with self.locks[i]:
+                worker.attach_coverage(shm.name, self.fuzzers)
+        # restarts caused by the inputs of each fuzzer
+        self.fuzzer_restarts: Dict[Fuzzer, int] = {
+            fuzzer: 0
+            for fuzzer in self.fuzzers
+        }
+        # set by the caller, see edgestore.EdgeStore
+        self.edge_store: Optional[EdgeStore] = None
+        self.stopped = threading.Event()
+        self.supervisor = threading.Thread(target=self.supervise_loop,
+                                           daemon=True)
+        self.supervisor.start()
+
+    def __len__(self):
+        return len(self.workers)
+
+    def shard(self, f) -> int:
+        return int(checksum(f), 16) % len(self.workers)
+
+    def execute_batch(
+            self,
+            fuzzer_files,
+            exec_timeout=None,
+            batch_size=None) -> List[Optional[Tuple[bool, bool]]]:
+        '''
+        run all (fuzzer, f) of fuzzer_files, each worker gets the files of
+        its shard batch_size (BATCH_SIZE) at a time, one thread per worker
+
+        returns (crashed, new coverage) in the order of fuzzer_files, None
+        for the file that killed or wedged its worker; the worker is
+        restarted and the other files of that batch are run again
+        '''
+        if batch_size is None:
+            batch_size = self.BATCH_SIZE
+        shards: List[List[int]] = [[] for _ in self.workers]
+        for n, (fuzzer, f) in enumerate(fuzzer_files):
+            shards[self.shard(f)].append(n)
+        results: List[Optional[Tuple[bool, bool]]] = [
+            (False, False)
+        ] * len(fuzzer_files)
+        errors = []
+        store = self.edge_store
+
+        def run_shard(i, shard):
+            try:
+                parts = collections.deque(
+                    shard[start:start + batch_size]
+                    for start in range(0, len(shard), batch_size))
+                while parts:
+                    part = parts.popleft()
+                    batch = []
+                    for n in part:
+                        fuzzer, f = fuzzer_files[n]
+                        batch.append((fuzzer, f, checksum(f)))
+                    try:
+                        with self.locks[i]:
+                            ret = self.workers[i].execute_batch(
+                                batch, exec_timeout, store is not None)
+                    except ForkserverError as e:
+                        if e.done is None or e.done >= len(part):
+                            lost = part
+                        else:
+                            # only the input the worker got stuck on or died
+                            # with is lost, the others run again
+                            lost = part[e.done:e.done + 1]
+                            if part[e.done + 1:]:
+                                parts.appendleft(part[e.done + 1:])
+                            if e.done:
+                                parts.appendleft(part[:e.done])
+                        logger.warning(
+                            f'worker {i} lost {len(lost)} inputs: {e}')
+                        for n in lost:
+                            self.fuzzer_restarts[fuzzer_files[n][0]] += 1
+                            results[n] = None
+                        continue
+                    self.versions[i] = ret['version']
+                    for n, crashed, new_coverage in zip(
+                            part, ret['crashed'], ret['new_coverage']):
+                        results[n] = (crashed, new_coverage)
+                    if store is not None:
+                        for (_, _, c), edges in zip(batch, ret['edges']):
+                            if edges is not None:
+                                store.add(c, edges)
+            except Exception as e:
+                errors.append(e)
+
+        threads = []
+        for i, shard in enumerate(shards):
+            if not shard: continue
+            t = threading.Thread(target=run_shard, args=(i, shard))
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def get_worker_bitmap(self, i, fuzzer) -> bitarray:
+        '''
+        read-only view of the coverage of fuzzer in worker i, no copy
+        '''
+        offset = self.rows + self.fuzzers.index(fuzzer) * self.row_size
+        buf = self.shms[i].buf[offset:offset + self.row_size].toreadonly()
+        bits = bitarray(buffer=buf, endian=Bitmap.ENDIAN)
+        if len(bits) != self.map_size:
+            # padding bits, a buffer backed bitarray can't be resized
+            bits = bits[:self.map_size]
+        return bits
+
+    def get_version(self, fuzzer) -> int:
+        '''
+        increases whenever the coverage of fuzzer grows in any worker
+        '''
+        slot = self.fuzzers.index(fuzzer)
+        return int(sum(versions[slot] for versions in self.fuzzer_versions))
+
+    def changed_since(self, fuzzer, version) -> bool:
+        return self.get_version(fuzzer) != version
+
+    def get_bitmap(self, fuzzer):
+        '''
+        the bits are only ever set by the workers, a concurrent update is
+        either seen or picked up next time; read the version before the
+        bitmap to not miss it
+
+        returns a private snapshot, the rows keep changing while callers
+        compare and merge the bitmap several times
+        '''
+        bitmap = None
+        for i in range(len(self.workers)):
+            bits = self.get_worker_bitmap(i, fuzzer)
+            if bitmap is None:
+                bitmap = bits
+            elif bitmap.readonly:
+                bitmap = bitmap | bits
+            else:
+                bitmap |= bits
+        if bitmap.readonly:
+            # NOTE: a single worker, one copy of its row
+            bitmap = bitmap.copy()
+        return AFLBitmap(bitmap)
+
+    def get_map_size(self):
+        with self.locks[0]:
+            return self.workers[0].get_map_size()
+
+    def supervise(self):
+        '''
+        respawn the idle workers that died, a busy worker is handled by the
+        request waiting for it
+        '''
+        for i, worker in enumerate(self.workers):
+            if not self.locks[i].acquire(blocking=False):
+                continue
+            try:
+                if self.stopped.is_set() or worker.is_alive():
+                    continue
+                logger.warning(f'worker {i} died with exit code '
+                               f'{worker.p.exitcode}, respawn it')
+                worker.restart_forkserver()
+            except ForkserverError as e:
+                logger.error(f'respawn of worker {i} failed: {e}')
+            finally:
+                self.locks[i].release()
+
+    def supervise_loop(self):
+        while not self.stopped.wait(self.SUPERVISE_INTERVAL):
+            self.supervise()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'workers': len(self.workers),
+            'alive': sum(worker.is_alive() for worker in self.workers),
+            'restarts': [worker.restarts for worker in self.workers],
+            'fuzzer_restarts': dict(self.fuzzer_restarts),
+        }
+
+    def close_coverage(self):
+        self.fuzzer_versions = []
+        for shm in self.shms:
+            try:
+                shm.close()
+            except BufferError:
+                # NOTE: a bitmap still points into the segment
+                logger.debug(f'{shm.name} is still in use')
+            shm.unlink()
+        self.shms = []
+
+    def cleanup(self):
+        self.stopped.set()
+        for i, worker in enumerate(self.workers):
+            with self.locks[i]:
+                worker.cleanup()
+        self.close_coverage()
+
+    def stop(self):
+        self.stopped.set()
+        for worker in self.workers:
+            worker.stop()
+        self.close_coverage()
+
+
 def get_all_names(include_global=True):
     global FUZZERS
     ret = FUZZERS
@@ -531,11 +1119,24 @@ def init():
     MAP['log_file'] = top_dir / 'eval.log'
     MAP['log_file_latest'] = top_dir / 'eval-latest.log'
     MAP['seed_finished_file'] = top_dir / 'seed-finished'
-    MAP['lock_path'] = top_dir / 'lock'
     MAP['coverage_path'] = top_dir / 'cov.json'
+    MAP['map_size_path'] = top_dir / 'map_size'
+    MAP['edge_store_path'] = top_dir / 'edges.store'
     os.makedirs(top_dir, exist_ok=True)
 
     binary, binary_arguments = find_executable_from_cmd()
+    EXECUTOR = AFLForkserverPool(binary, binary_arguments,
+                                 get_all_names(False), ARGS.workers,
+                                 ARGS.exec_timeout)
+    logger.info(f'evaluator uses {len(EXECUTOR)} forkserver workers')
+    init_map_size(EXECUTOR.get_map_size())
+    global EDGE_INDEX, EDGE_STORE
+    EDGE_INDEX = EdgeIndex(get_all_names(False))
+    if ARGS.edge_store:
+        EDGE_STORE = EdgeStore(MAP['edge_store_path'], Bitmap.BITMAP_SIZE)
+        EXECUTOR.edge_store = EDGE_STORE
+        logger.info(f'{len(EDGE_STORE)} inputs in the edge store')
+
     for fuzzer in get_all_names():
         eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
         assert eval_fuzzer_root
@@ -551,7 +1152,7 @@ def init():
         os.makedirs(dir_unique_bugs_trace, exist_ok=True)
         os.makedirs(dir_unique_bugs_trace3, exist_ok=True)
         FUZZER_BITMAP[fuzzer] = AFLBitmap.empty()
-        EXECUTOR[fuzzer] = AFLForkserverProcess(binary, binary_arguments)
+        BITMAP_SEQ[fuzzer] = 0
         PROCESSED_FILE[fuzzer] = set()
         PROCESSED_CHECKSUM[fuzzer] = set()
         crash_set[fuzzer] = set()
@@ -569,6 +1170,25 @@ def init():
         INDEX_UNIQUE_BUG_TRACE3[fuzzer] = 0
 
 
+def init_map_size(map_size):
+    '''
+    record the map size reported by the forkserver once per campaign, all
+    bitmaps are sized from it
+
+    NOTE: the shipped aflforkserver.so returns its compile time MAP_SIZE
+    (1 MiB) whatever the target, so for now this only fixes the size per
+    campaign; bitmaps shrink once the library reports the map of the target
+    '''
+    global MAP
+    if map_size <= 0:
+        logger.critical(f'invalid map size {map_size}, use default')
+        map_size = Bitmap.BITMAP_SIZE
+    Bitmap.set_map_size(map_size)
+    with utils.atomic_write(MAP['map_size_path']) as f:
+        f.write(f'{map_size}')
+    logger.debug(f'map size is {map_size}')
+
+
 def log(msg):
     global MAP
     with open(MAP['log_file'], 'a') as f:
@@ -853,16 +1473,27 @@ def in_blacklist(f):
     return False
 
 
+# serializes publishers of the same file, readers never take it
+PUBLISH_LOCK = threading.Lock()
+
+
 def save_fuzzer_bitmap(fuzzer):
     eval_fuzzer_root = get_eval_fuzzer_root(fuzzer)
     assert eval_fuzzer_root
     bitmap_path = eval_fuzzer_root / 'bitmap'
-    fuzzer_bitmap = FUZZER_BITMAP[fuzzer].bitmap
-    lock_path = MAP['lock_path']
-    lock = filelock.FileLock(lock_path, timeout=100)
-    with lock:
-        with open(bitmap_path, 'wb+') as f:
-            f.write(fuzzer_bitmap)
+    # NOTE: snapshot, the bitmap could be updated while writing
+    fuzzer_bitmap = AFLBitmap(FUZZER_BITMAP[fuzzer].bitmap.copy())
+    count = fuzzer_bitmap.count()
+    with PUBLISH_LOCK:
+        # bitmaps only grow, same count means nothing new to publish
+        if BITMAP_PUBLISHED_COUNT.get(fuzzer) == count and os.path.exists(
+                bitmap_path):
+            return
+        BITMAP_SEQ[fuzzer] += 1
+        # NOTE: readers mmap the bitmap, never truncate a published file
+        with utils.atomic_write(bitmap_path, 'wb') as f:
+            fuzzer_bitmap.tofile(f, seq=BITMAP_SEQ[fuzzer])
+        BITMAP_PUBLISHED_COUNT[fuzzer] = count
 
 
 def save_fuzzer_crashes(fuzzer):
@@ -870,29 +1501,111 @@ def save_fuzzer_crashes(fuzzer):
     assert eval_fuzzer_root
     log_path = eval_fuzzer_root / 'crashrunner-latest.log'
     log_path_new = eval_fuzzer_root / 'crashrunner-new-latest.json'
-    lock_path = MAP['lock_path']
-    lock = filelock.FileLock(lock_path, timeout=100)
     m = {}
     m['unique_bugs'] = len(crash_set[fuzzer])
     m['unique_bugs_ip'] = len(crash_set_ip[fuzzer])
     m['unique_bugs_trace'] = len(crash_set_trace[fuzzer])
     m['unique_bugs_trace3'] = len(crash_set_trace3[fuzzer])
 
-    with lock:
-        with open(log_path, 'w') as f:
+    with PUBLISH_LOCK:
+        with utils.atomic_write(log_path) as f:
             msg = f'unique bugs: {len(crash_set[fuzzer])}\n'
             f.write(msg)
 
-        with open(log_path_new, 'w') as f:
+        with utils.atomic_write(log_path_new) as f:
             msg = json.dumps(m, default=json_dumper)
             f.write(f'{msg}')
 
 
+# coverage version of the pool when the bitmap of a fuzzer was last added
+FETCHED_VERSION: Dict[Fuzzer, int] = {}
+
+
 def add_all_bitmap():
-    global EXECUTOR
+    global EXECUTOR, FETCHED_VERSION
     for fuzzer in get_all_names(False):
-        afl_bitmap_f = EXECUTOR[fuzzer].get_bitmap()
+        version = EXECUTOR.get_version(fuzzer)
+        if FETCHED_VERSION.get(fuzzer) == version:
+            continue
+        afl_bitmap_f = EXECUTOR.get_bitmap(fuzzer)
         add_fuzzer_bitmap(fuzzer, afl_bitmap_f)
+        FETCHED_VERSION[fuzzer] = version
+
+
+# fuzz_bitmap path -> (st_mtime_ns, st_size) when last imported
+IMPORTED_BITMAP: Dict[Path, Tuple[int, int]] = {}
+# bumped whenever an imported bitmap adds coverage
+IMPORT_VERSION = 0
+# the imported bitmap of each fuzzer is complete up to this time
+IMPORT_AS_OF: Dict[Fuzzer, float] = {}
+# fuzzers with at least one fuzz_bitmap imported, the queue of the others is
+# still replayed
+IMPORTED_FUZZERS: Set[Fuzzer] = set()
+
+
+def is_import_fuzzer(fuzzer) -> bool:
+    '''
+    a fuzzer instrumenting the binary the evaluator replays with has the
+    same edges, its fuzz_bitmap is what replaying its queue would give
+    '''
+    if not ARGS.import_bitmap:
+        return False
+    fuzzer_config = config['fuzzer'].get(fuzzer, {})
+    return (fuzzer_config.get('target_root') ==
+            config['evaluator']['binary_root'])
+
+
+def is_imported(fuzzer) -> bool:
+    return fuzzer in IMPORTED_FUZZERS
+
+
+def import_fuzzer_bitmap(fuzzer):
+    '''
+    add the fuzz_bitmap of every instance of fuzzer to its bitmap
+
+    AFL keeps its virgin bits there, 0xff for edges never hit, and rewrites
+    it with fuzzer_stats about every minute if it changed; so the imported
+    bitmap is complete up to the oldest fuzzer_stats of the instances
+
+    AFL's map (64 KiB) may be smaller than the one of the forkserver, the
+    edges past its end are never hit
+    '''
+    global IMPORT_VERSION
+    fuzzer_root = get_fuzzer_root(fuzzer)
+    assert fuzzer_root
+    if not fuzzer_root.exists():
+        return
+    as_of = []
+    for bitmap_path in fuzzer_root.rglob('fuzz_bitmap'):
+        try:
+            st = bitmap_path.stat()
+            as_of.append(
+                (bitmap_path.parent / 'fuzzer_stats').stat().st_mtime)
+        except OSError:
+            continue
+        version = (st.st_mtime_ns, st.st_size)
+        if IMPORTED_BITMAP.get(bitmap_path) == version:
+            continue
+        if st.st_size == 0 or st.st_size > Bitmap.BITMAP_SIZE:
+            logger.warning(f'{bitmap_path}: {st.st_size} bytes, the map '
+                           f'size is {Bitmap.BITMAP_SIZE}, not imported')
+            IMPORTED_BITMAP[bitmap_path] = version
+            continue
+        with open(bitmap_path, 'rb') as f:
+            content = f.read()
+        # NOTE: AFL rewrites the file in place, try again next time
+        if len(content) != st.st_size:
+            continue
+        IMPORTED_BITMAP[bitmap_path] = version
+        if len(content) < Bitmap.BITMAP_SIZE:
+            content += b'\xff' * (Bitmap.BITMAP_SIZE - len(content))
+        bitmap = AFLBitmap(content)
+        IMPORTED_FUZZERS.add(fuzzer)
+        if bitmap > FUZZER_BITMAP[fuzzer]:
+            add_fuzzer_bitmap(fuzzer, bitmap)
+            IMPORT_VERSION += 1
+    if as_of:
+        IMPORT_AS_OF[fuzzer] = min(as_of)
 
 
 def save_all_bitmap(add=True):
@@ -900,23 +1613,68 @@ def save_all_bitmap(add=True):
         add_all_bitmap()
     for fuzzer in get_all_names():
         save_fuzzer_bitmap(fuzzer)
+    publish_edge_index()
+    save_coverage()
 
 
 def save_all_crash(add=True):
     for fuzzer in get_all_names():
         save_fuzzer_crashes(fuzzer)
+    save_coverage()
 
 
 BITMAP_LOCK = threading.Lock()
 
 
 def add_fuzzer_bitmap(fuzzer, bitmap):
-    global FUZZER_BITMAP, BITMAP_LOCK
+    global FUZZER_BITMAP, BITMAP_LOCK, EDGE_INDEX
     with BITMAP_LOCK:
+        if bitmap > FUZZER_BITMAP['global']:
+            EDGE_INDEX.discover(fuzzer, bitmap - FUZZER_BITMAP['global'])
+        if bitmap > FUZZER_BITMAP[fuzzer]:
+            EDGE_INDEX.add(fuzzer, bitmap - FUZZER_BITMAP[fuzzer])
         FUZZER_BITMAP[fuzzer] |= bitmap
         FUZZER_BITMAP['global'] |= bitmap
 
 
+def add_seed_bitmap(bitmap):
+    '''
+    the seeds are shared by all fuzzers, none of them found their edges
+    '''
+    global FUZZER_BITMAP, BITMAP_LOCK, EDGE_INDEX
+    with BITMAP_LOCK:
+        if bitmap > FUZZER_BITMAP['global']:
+            EDGE_INDEX.discover(None, bitmap - FUZZER_BITMAP['global'])
+        FUZZER_BITMAP['global'] |= bitmap
+
+
+def publish_edge_index():
+    global EDGE_INDEX, EDGE_INDEX_PUBLISHED
+    with BITMAP_LOCK:
+        if (EDGE_INDEX_PUBLISHED is not None
+                and EDGE_INDEX_PUBLISHED.version == EDGE_INDEX.version):
+            return
+        # NOTE: readers keep references, never modify a published index
+        EDGE_INDEX_PUBLISHED = EDGE_INDEX.copy()
+
+
+def get_edge_index() -> Optional[EdgeIndex]:
+    return EDGE_INDEX_PUBLISHED
+
+
+def get_edge_store() -> Optional[EdgeStore]:
+    return EDGE_STORE
+
+
+def new_epoch() -> int:
+    '''
+    edges found from now on are recorded with the returned epoch
+    '''
+    global EDGE_INDEX
+    with BITMAP_LOCK:
+        return EDGE_INDEX.new_epoch()
+
+
 def sync():
     global BITMAP_LOCK, FUZZER_BITMAP, PROCESSED_CHECKSUM
     global PROCESSED_FILE
@@ -926,6 +1684,7 @@ def sync():
         with PROCESSED_LOCK:
             for fuzzer in get_all_names(False):
                 FUZZER_BITMAP['global'] |= FUZZER_BITMAP[fuzzer]
+            EDGE_INDEX.merge()
             log_profile(f'phase1: {time.time()-start}s')
             for fuzzer in get_all_names():
                 start2 = time.time()
@@ -937,19 +1696,332 @@ def sync():
                     f'phase2: {fuzzer} {time.time()-start2}s, {time.time()-start}s'
                 )
                 save_fuzzer_bitmap(fuzzer)
-        log_profile(f'overall: {time.time()-start}s')
+    publish_edge_index()
+    save_coverage()
+    log_profile(f'overall: {time.time()-start}s')
 
 
-def process_fuzzer_queue_one(fuzzer, f):
-    global MAP, ARGS, EXECUTOR
-    if in_blacklist(f): return
-    if not os.path.isfile(f): return
-    is_p = is_processed(fuzzer, f)
-    checksum_f = checksum(f)
-    afl_bitmap_f = None
-    if not is_p:
-        EXECUTOR[fuzzer].execute(f)
-    add_processed(fuzzer, f)
+class FairQueue(object):
+    '''
+    test cases waiting for evaluation, a FIFO per fuzzer
+
+    take() serves the fuzzers round robin, weight test cases of a fuzzer per
+    turn, so a fuzzer flooding its queue only delays itself; the scheduler
+    raises the weight of the fuzzers whose bitmaps it is about to read
+    '''
+    def __init__(self, weight=1):
+        self.queues: Dict[Fuzzer, Deque[Path]] = collections.OrderedDict()
+        # ctime of each queued test case, and of the ones taken but not done
+        self.ctimes: Dict[Fuzzer, Deque[Optional[float]]] = {}
+        self.taken: Dict[Fuzzer, List[float]] = {}
+        self.weights: Dict[Fuzzer, int] = {}
+        self.default_weight = weight
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(q) for q in self.queues.values())
+
+    def put(self, fuzzer, f, ctime=None):
+        with self.lock:
+            if fuzzer not in self.queues:
+                self.queues[fuzzer] = collections.deque()
+                self.ctimes[fuzzer] = collections.deque()
+            self.queues[fuzzer].append(f)
+            self.ctimes[fuzzer].append(ctime)
+
+    def take(self, n) -> List[Tuple[Fuzzer, Path]]:
+        ret: List[Tuple[Fuzzer, Path]] = []
+        with self.lock:
+            while len(ret) < n and any(self.queues.values()):
+                for fuzzer in list(self.queues):
+                    q = self.queues[fuzzer]
+                    weight = self.weights.get(fuzzer, self.default_weight)
+                    for _ in range(min(weight, len(q), n - len(ret))):
+                        ret.append((fuzzer, q.popleft()))
+                        ctime = self.ctimes[fuzzer].popleft()
+                        if ctime is not None:
+                            self.taken.setdefault(fuzzer, []).append(ctime)
+                    # NOTE: next take starts from the fuzzer after this one
+                    self.queues.move_to_end(fuzzer)
+                    if len(ret) >= n:
+                        break
+        return ret
+
+    def set_weights(self, weights: Dict[Fuzzer, int]):
+        with self.lock:
+            self.weights = dict(weights)
+
+    def drain(self) -> List[Tuple[Fuzzer, Path, Optional[float]]]:
+        '''
+        remove and return everything queued, with the ctimes
+        '''
+        with self.lock:
+            ret = [(fuzzer, f, ctime)
+                   for fuzzer, q in self.queues.items()
+                   for f, ctime in zip(q, self.ctimes[fuzzer])]
+            for fuzzer in self.queues:
+                self.queues[fuzzer].clear()
+                self.ctimes[fuzzer].clear()
+        return ret
+
+    def done(self):
+        '''
+        the test cases taken so far are evaluated
+        '''
+        with self.lock:
+            self.taken = {}
+
+    def oldest(self, fuzzer) -> Optional[float]:
+        '''
+        ctime of the oldest test case of fuzzer not evaluated yet
+        '''
+        with self.lock:
+            ctimes = [
+                ctime for ctime in self.ctimes.get(fuzzer, ())
+                if ctime is not None
+            ]
+            ctimes += self.taken.get(fuzzer, [])
+        return min(ctimes) if ctimes else None
+
+    def depth(self) -> Dict[Fuzzer, int]:
+        with self.lock:
+            return {fuzzer: len(q) for fuzzer, q in self.queues.items()}
+
+
+# normal test cases waiting for evaluation
+EVAL_QUEUE = FairQueue()
+# weight of the fuzzers the scheduler is looking at, the others have 1
+PRIORITY_WEIGHT = 4
+
+
+def set_priority(fuzzers):
+    '''
+    evaluate the test cases of fuzzers first, the scheduler is about to
+    read their bitmaps
+    '''
+    EVAL_QUEUE.set_weights({fuzzer: PRIORITY_WEIGHT for fuzzer in fuzzers})
+
+
+def get_queue_depth() -> Dict[Fuzzer, int]:
+    '''
+    test cases of each fuzzer waiting for evaluation, deferred ones and hangs
+    included
+    '''
+    depth = EVAL_QUEUE.depth()
+    for fuzzer, n in DEFERRED_QUEUE.depth().items():
+        depth[fuzzer] = depth.get(fuzzer, 0) + n
+    for fuzzer, _ in list(HANG_QUEUE):
+        depth[fuzzer] = depth.get(fuzzer, 0) + 1
+    return depth
+
+
+# test cases put off by the degraded mode, evaluated when EVAL_QUEUE is empty
+DEFERRED_QUEUE = FairQueue()
+DEGRADED = False
+DEGRADED_SINCE: Optional[float] = None
+# seconds spent in degraded mode so far
+DEGRADED_TIME = 0.0
+# evaluated test cases of each fuzzer
+EVALUATED_COUNT: Dict[Fuzzer, int] = collections.defaultdict(int)
+# a fuzzer with less evaluated test cases than this share of the average
+# is under-sampled
+UNDERSAMPLED_RATIO = 0.5
+
+
+def is_undersampled(fuzzer) -> bool:
+    fuzzers = get_all_names(False)
+    if not fuzzers:
+        return False
+    average = sum(EVALUATED_COUNT[f] for f in fuzzers) / len(fuzzers)
+    return EVALUATED_COUNT[fuzzer] < UNDERSAMPLED_RATIO * average
+
+
+def queue_test_case(fuzzer, f, ctime=None):
+    if DEGRADED and not watcher.is_new_coverage(
+            Path(f)) and not is_undersampled(fuzzer):
+        DEFERRED_QUEUE.put(fuzzer, f, ctime)
+    else:
+        EVAL_QUEUE.put(fuzzer, f, ctime)
+
+
+def update_degraded():
+    '''
+    above degraded_backlog queued test cases, only the ones tagged as new
+    coverage and the ones of under-sampled fuzzers are evaluated right
+    away, the rest is deferred to idle time; back to normal once the backlog,
+    deferred test cases included, is down to half
+
+    NOTE: deferred test cases hold the watermarks back, the barrier waits
+    for them like for any other test case
+    '''
+    global DEGRADED, DEGRADED_SINCE, DEGRADED_TIME
+    if not ARGS.degraded_backlog:
+        return
+    backlog = len(EVAL_QUEUE) + len(DEFERRED_QUEUE)
+    if not DEGRADED and backlog > ARGS.degraded_backlog:
+        DEGRADED = True
+        DEGRADED_SINCE = time.time()
+        for fuzzer, f, ctime in EVAL_QUEUE.drain():
+            queue_test_case(fuzzer, f, ctime)
+        msg = (f'degraded mode on, backlog {backlog}, '
+               f'{len(DEFERRED_QUEUE)} test cases deferred')
+        logger.warning(msg)
+        log(msg)
+    elif DEGRADED and backlog <= ARGS.degraded_backlog // 2:
+        DEGRADED = False
+        assert DEGRADED_SINCE is not None
+        DEGRADED_TIME += time.time() - DEGRADED_SINCE
+        msg = (f'degraded mode off after {time.time() - DEGRADED_SINCE}s, '
+               f'{len(DEFERRED_QUEUE)} test cases deferred')
+        logger.warning(msg)
+        log(msg)
+
+
+def get_oldest(fuzzer) -> Optional[float]:
+    '''
+    ctime of the oldest test case of fuzzer waiting for evaluation, deferred
+    ones included
+    '''
+    ctimes = [
+        ctime for ctime in (EVAL_QUEUE.oldest(fuzzer),
+                            DEFERRED_QUEUE.oldest(fuzzer))
+        if ctime is not None
+    ]
+    return min(ctimes) if ctimes else None
+
+
+def get_degraded() -> Dict[str, Any]:
+    degraded_time = DEGRADED_TIME
+    if DEGRADED and DEGRADED_SINCE is not None:
+        degraded_time += time.time() - DEGRADED_SINCE
+    return {
+        'degraded': DEGRADED,
+        'degraded_time': degraded_time,
+        'deferred': len(DEFERRED_QUEUE),
+    }
+
+
+# when the watchers of each fuzzer were last scanned
+SCAN_TIME: Dict[Fuzzer, float] = {}
+# watermarks of the last publication, see wait_evaluated
+PUBLISHED_WATERMARK: Dict[Fuzzer, float] = {}
+WATERMARK_COND = threading.Condition()
+
+
+def get_watermark(fuzzer) -> float:
+    '''
+    every test case of fuzzer created at or before the returned time has
+    been evaluated; hangs are not waited for
+
+    an imported fuzzer is caught up once a scan has imported whatever AFL
+    wrote, AFL only writes every minute or so and not at all while the
+    fuzzer gets no CPU; get_lag reports how old that is
+    '''
+    scan_time = SCAN_TIME.get(fuzzer)
+    if scan_time is None:
+        return 0
+    # NOTE: a watcher sees a file a little after it is created
+    watermark = scan_time - watcher.Watcher.FILE_READ_DELAY
+    oldest = get_oldest(fuzzer)
+    if oldest is not None:
+        watermark = min(watermark, math.nextafter(oldest, -math.inf))
+    return watermark
+
+
+def get_lag() -> Dict[Fuzzer, float]:
+    '''
+    age in seconds of the oldest test case of each fuzzer waiting for
+    evaluation, 0 if there is none
+    '''
+    now = time.time()
+    lag = {}
+    for fuzzer in get_all_names(False):
+        if is_imported(fuzzer):
+            # NOTE: age of the data AFL wrote, no queue to wait for
+            as_of = IMPORT_AS_OF.get(fuzzer)
+            lag[fuzzer] = 0 if as_of is None else max(0, now - as_of)
+            continue
+        oldest = get_oldest(fuzzer)
+        lag[fuzzer] = 0 if oldest is None else max(0, now - oldest)
+    return lag
+
+
+def wait_evaluated(fuzzers, t=None, timeout=None) -> bool:
+    '''
+    barrier: wait until the test cases of fuzzers created at or before t
+    (now by default) are evaluated and published, or timeout; returns
+    whether they are
+    '''
+    if t is None:
+        t = time.time()
+    # NOTE: wake the watcher thread up, its next scan moves the watermarks
+    watcher.notify_test_case()
+    with WATERMARK_COND:
+        return WATERMARK_COND.wait_for(
+            lambda: all(
+                PUBLISHED_WATERMARK.get(fuzzer, 0) >= t
+                for fuzzer in fuzzers), timeout)
+
+
+def get_pending_files(fuzzer_files):
+    pending = []
+    for fuzzer, f in fuzzer_files:
+        if in_blacklist(f): continue
+        if not os.path.isfile(f): continue
+        if not is_processed(fuzzer, f):
+            pending.append((fuzzer, f))
+    return pending
+
+
+# hangs and inputs that wedged a worker, replayed by process_hang_files
+# after the normal inputs
+HANG_QUEUE: Deque[Tuple[Fuzzer, Path]] = collections.deque()
+# hangs replayed in one message, small to keep to hang_budget
+HANG_BATCH_SIZE = 4
+# seconds hangs wait at most while normal test cases are pending
+HANG_INTERVAL = 60
+
+
+def process_fuzzer_queue_batch(fuzzer_files):
+    '''
+    evaluate the files not processed yet, the pool runs them in batches on
+    all workers
+    '''
+    pending = get_pending_files(fuzzer_files)
+    results = EXECUTOR.execute_batch(pending)
+    for (fuzzer, f), result in zip(pending, results):
+        if result is None:
+            HANG_QUEUE.append((fuzzer, f))
+            continue
+        add_processed(fuzzer, f)
+        EVALUATED_COUNT[fuzzer] += 1
+
+
+def process_hang_files():
+    '''
+    low priority lane for hangs: a short per exec timeout, a few inputs per
+    message and at most hang_budget seconds per round, the rest waits for
+    the next round
+    '''
+    deadline = time.time() + ARGS.hang_budget
+    dropped = 0
+    while HANG_QUEUE and time.time() < deadline:
+        count = min(len(HANG_QUEUE), HANG_BATCH_SIZE * len(EXECUTOR))
+        fuzzer_files = [HANG_QUEUE.popleft() for _ in range(count)]
+        pending = get_pending_files(fuzzer_files)
+        results = EXECUTOR.execute_batch(pending, ARGS.hang_timeout,
+                                         HANG_BATCH_SIZE)
+        for (fuzzer, f), result in zip(pending, results):
+            # NOTE: no second chance, an input wedging the worker even with
+            # the short timeout is dropped
+            if result is None:
+                dropped += 1
+            add_processed(fuzzer, f)
+    if dropped:
+        logger.warning(f'{dropped} hangs dropped, they wedged the forkserver')
+    if HANG_QUEUE:
+        logger.debug(f'{len(HANG_QUEUE)} hangs left for the next round')
 
 
 def process_crash_one(fuzzer, f):
@@ -1084,17 +2156,50 @@ def process_crash_one(fuzzer, f):
     # log(f'{err_path}, {ID}, {bug_id[ID]}, {len(crash_set)}')
 
 
-def process_coverage_fuzzer_files(fuzzer_files):
+def process_coverage_fuzzer_files(fuzzer_files, publish=True):
     THRESHOLD = 1000
-    counter = 0
     l = len(fuzzer_files)
-    for fuzzer, f in fuzzer_files:
-        process_fuzzer_queue_one(fuzzer, f)
-        counter += 1
-        if counter % THRESHOLD == 0:
+    for start in range(0, l, THRESHOLD):
+        counter = start + THRESHOLD
+        process_fuzzer_queue_batch(fuzzer_files[start:counter])
+        if counter < l:
             logger.debug(f'process coverage files count : {counter}/{l}')
-            save_all_bitmap(True)
-    save_all_bitmap(True)
+            if publish:
+                save_all_bitmap(True)
+    if publish:
+        save_all_bitmap(True)
+
+
+def process_seed_files(input_files):
+    '''
+    every fuzzer starts from the same seeds, run them once and give the
+    result to all fuzzers; fuzzers are not running yet, so use all cores
+    '''
+    input_files = [
+        f for f in input_files if not in_blacklist(f) and os.path.isfile(f)
+    ]
+    if not input_files: return
+    start = time.time()
+    binary, binary_arguments = find_executable_from_cmd()
+    # NOTE: the cores we may run on, os.cpu_count() is the host's in a
+    # container
+    cores = len(os.sched_getaffinity(0))
+    workers = min(max(cores, ARGS.workers), len(input_files))
+    seed_pool = AFLForkserverPool(binary, binary_arguments, ['global'],
+                                  workers, ARGS.exec_timeout)
+    seed_pool.edge_store = EDGE_STORE
+    try:
+        seed_pool.execute_batch([('global', f) for f in input_files])
+        seed_bitmap = seed_pool.get_bitmap('global')
+        add_seed_bitmap(seed_bitmap)
+        for fuzzer in get_all_names(False):
+            add_fuzzer_bitmap(fuzzer, seed_bitmap)
+            for f in input_files:
+                add_processed(fuzzer, f)
+    finally:
+        seed_pool.cleanup()
+    logger.info(f'{len(input_files)} seeds evaluated by {workers} workers '
+                f'in {time.time()-start}s')
 
 
 def process_crash_fuzzer_files(fuzzer_files):
@@ -1143,8 +2248,10 @@ def process_coverage():
             fuzzer_files += get_coverage_fuzzer_files(fuzzer)
         if fuzzer_files:
             # to keep fair
-            random.shuffle(fuzzer_files)
-            process_coverage_fuzzer_files(fuzzer_files)
+            queue = FairQueue()
+            for fuzzer, f in fuzzer_files:
+                queue.put(fuzzer, f)
+            process_coverage_fuzzer_files(queue.take(len(fuzzer_files)))
             save_all_bitmap()
             FIRST_COVERAGE = False
         else:
@@ -1184,14 +2291,16 @@ def crash_thread():
     process_crash()
 
 
-def get_fuzzer_files(fuzzer: Fuzzer) -> Tuple[List[Path], List[Path]]:
+def get_fuzzer_files(
+        fuzzer: Fuzzer) -> Tuple[List[Path], List[Path], List[Path]]:
     global ARGS
     coverage_files = []
     crash_files = []
+    hang_files = []
     fuzzer_root_dir = get_fuzzer_root(fuzzer)
     assert fuzzer_root_dir
     if not fuzzer_root_dir.exists():
-        return [], []
+        return [], [], []
     assert fuzzer_root_dir
     if utils.fuzzer_has_subdir(FuzzerType(fuzzer)):
         for subdir in fuzzer_root_dir.iterdir():
@@ -1202,7 +2311,7 @@ def get_fuzzer_files(fuzzer: Fuzzer) -> Tuple[List[Path], List[Path]]:
         watcher.init_watcher(fuzzer, fuzzer_root_dir)
     # not ready
     if fuzzer not in watcher.WATCHERS:
-        return [], []
+        return [], [], []
     watchers = watcher.WATCHERS[fuzzer]
     for w in watchers:
         # prevent iterating while changing
@@ -1213,18 +2322,24 @@ def get_fuzzer_files(fuzzer: Fuzzer) -> Tuple[List[Path], List[Path]]:
             if w._ignore_test_case(test_case_path):
                 continue
             seed_type = w._get_test_case_type(test_case_path)
-            if seed_type == SeedType.NORMAL or seed_type == SeedType.HANG:
+            if seed_type == SeedType.NORMAL:
                 coverage_files.append(test_case_path)
+            elif seed_type == SeedType.HANG:
+                hang_files.append(test_case_path)
             elif seed_type == SeedType.CRASH:
                 crash_files.append(test_case_path)
             else:
                 assert False, 'unknow seed type'
         LAST_INDEX[w] = queue_len
 
-    return coverage_files, crash_files
+    return coverage_files, crash_files, hang_files
 
 
 def save_coverage():
+    '''
+    compact summary of the published bitmaps and crashes, enough for logging
+    without loading any bitmap
+    '''
     global MAP
     ret = {}
     ret['coverage'] = {}
@@ -1232,49 +2347,137 @@ def save_coverage():
     ret['unique_bugs_ip'] = {}
     ret['unique_bugs_trace'] = {}
     ret['unique_bugs_trace3'] = {}
-    for fuzzer in get_all_names():
-        ret['coverage'][fuzzer] = int(FUZZER_BITMAP[fuzzer].count())
-        ret['unique_bugs'][fuzzer] = len(crash_set[fuzzer])
-        ret['unique_bugs_ip'][fuzzer] = len(crash_set_ip[fuzzer])
-        ret['unique_bugs_trace'][fuzzer] = len(crash_set_trace[fuzzer])
-        ret['unique_bugs_trace3'][fuzzer] = len(crash_set_trace3[fuzzer])
-    with open(MAP['coverage_path'], 'w') as f:
-        f.write(json.dumps(ret, default=json_dumper))
+    with PUBLISH_LOCK:
+        for fuzzer in get_all_names():
+            # NOTE: counts of the published bitmaps, no popcount needed
+            ret['coverage'][fuzzer] = BITMAP_PUBLISHED_COUNT.get(fuzzer, 0)
+            ret['unique_bugs'][fuzzer] = len(crash_set[fuzzer])
+            ret['unique_bugs_ip'][fuzzer] = len(crash_set_ip[fuzzer])
+            ret['unique_bugs_trace'][fuzzer] = len(crash_set_trace[fuzzer])
+            ret['unique_bugs_trace3'][fuzzer] = len(crash_set_trace3[fuzzer])
+        ret['evaluator'] = EXECUTOR.health()
+        ret['evaluator']['queue_depth'] = get_queue_depth()
+        ret['evaluator']['lag'] = get_lag()
+        ret['evaluator'].update(get_degraded())
+        # NOTE: the published index matches the published bitmaps
+        edge_index = EDGE_INDEX_PUBLISHED
+        if edge_index is not None:
+            ret['first_found'] = edge_index.first_found_count()
+        with utils.atomic_write(MAP['coverage_path']) as f:
+            f.write(json.dumps(ret, default=json_dumper))
+
+
+def get_publish_state():
+    '''
+    changes whenever there is something new to publish
+    '''
+    return (tuple(EXECUTOR.get_version(fuzzer)
+                  for fuzzer in get_all_names(False)), IMPORT_VERSION,
+            sum(len(crash_set[fuzzer]) for fuzzer in get_all_names()))
+
+
+def publisher_thread():
+    '''
+    publish bitmaps and crashes every publish_interval seconds, whatever the
+    watcher thread is doing, so that readers see new coverage as soon as
+    possible
+    '''
+    global PUBLISHED_WATERMARK
+    last_state = None
+    while True:
+        start = time.time()
+        # NOTE: before the state, what is evaluated by then gets published
+        watermarks = {
+            fuzzer: get_watermark(fuzzer)
+            for fuzzer in get_all_names(False)
+        }
+        state = get_publish_state()
+        if state != last_state:
+            save_all_bitmap()
+            save_all_crash()
+            last_state = state
+        with WATERMARK_COND:
+            PUBLISHED_WATERMARK = watermarks
+            WATERMARK_COND.notify_all()
+        time.sleep(max(0, ARGS.publish_interval - (time.time() - start)))
 
 
 def watcher_thread():
+    '''
+    process test cases as soon as the watchers report them; publication is
+    left to publisher_thread in --live mode
+    '''
+    if ARGS.live:
+        threading.Thread(target=publisher_thread, daemon=True).start()
+    last_hang = time.time()
     while True:
-        all_coverage_files = []
+        # NOTE: before scanning, what arrives meanwhile wakes the next wait
+        test_case_count = watcher.get_test_case_count()
         all_crash_files = []
 
         for fuzzer in get_all_names(False):
-            coverage_files, crash_files = get_fuzzer_files(fuzzer)
+            scan_time = time.time()
+            coverage_files, crash_files, hang_files = get_fuzzer_files(
+                fuzzer)
+            if is_import_fuzzer(fuzzer):
+                import_fuzzer_bitmap(fuzzer)
+            if is_imported(fuzzer):
+                # NOTE: covered by its fuzz_bitmap, only crashes are run
+                coverage_files, hang_files = [], []
             for f in coverage_files:
-                all_coverage_files.append((fuzzer, f))
+                try:
+                    ctime = os.stat(f).st_ctime
+                except OSError:
+                    ctime = scan_time
+                queue_test_case(fuzzer, f, ctime)
             for f in crash_files:
                 all_crash_files.append((fuzzer, f))
-
-        if all_coverage_files:
-            process_coverage_fuzzer_files(all_coverage_files)
+            for f in hang_files:
+                HANG_QUEUE.append((fuzzer, f))
+            # NOTE: after the test cases are queued, see get_watermark
+            SCAN_TIME[fuzzer] = scan_time
+        update_degraded()
+
+        if EVAL_QUEUE:
+            # NOTE: a batch per worker at a time, test cases of the other
+            # fuzzers get in before the rest of a flood
+            chunk = EVAL_QUEUE.take(EXECUTOR.BATCH_SIZE * len(EXECUTOR))
+            process_coverage_fuzzer_files(chunk, publish=False)
+            EVAL_QUEUE.done()
+        elif DEFERRED_QUEUE:
+            chunk = DEFERRED_QUEUE.take(EXECUTOR.BATCH_SIZE * len(EXECUTOR))
+            process_coverage_fuzzer_files(chunk, publish=False)
+            DEFERRED_QUEUE.done()
         else:
             log('coverage: no new files')
+        # hangs wait for the normal test cases, but not forever
+        if HANG_QUEUE and (not EVAL_QUEUE
+                           or time.time() - last_hang > HANG_INTERVAL):
+            process_hang_files()
+            last_hang = time.time()
         if all_crash_files:
             process_crash_fuzzer_files(all_crash_files)
             log('crash: no new files')
-        save_all_bitmap()
-        save_all_crash()
-        save_coverage()
 
+        if EVAL_QUEUE or DEFERRED_QUEUE or HANG_QUEUE:
+            continue
         if not ARGS.live:
+            save_all_bitmap()
+            save_all_crash()
             return
-
-        time.sleep(ARGS.sleep)
+        if all_crash_files:
+            continue
+        # ARGS.sleep bounds the wait, new fuzzer directories need a scan to
+        # get a watcher
+        if watcher.wait_test_case(test_case_count,
+                                  ARGS.sleep) != test_case_count:
+            # give the fuzzers some time to finish writing
+            time.sleep(watcher.Watcher.FILE_READ_DELAY)
 
 
 def handler(signal, frame):
     print('CTRL-C pressed!')
-    for fuzzer in get_all_names():
-        EXECUTOR[fuzzer].stop()
+    EXECUTOR.stop()
     sys.exit(0)
 
 
@@ -1297,14 +2500,10 @@ def main(raw_args=None):
 
     # handle initial seeds
     input_files = import_dir_files(ARGS.input)
-
-    for f in get_all_names(False):
-        fuzzer_files = [(f, inf) for inf in input_files]
-        process_coverage_fuzzer_files(fuzzer_files)
+    process_seed_files(input_files)
 
     save_all_bitmap()
     save_all_crash()
-    save_coverage()
     # seed only: used to evaluate coverage post run
     if ARGS.input_only:
         logger.debug(f'Only evaluate seeds')
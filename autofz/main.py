@@ -56,6 +56,9 @@ SYNC_TIME: int
 
 COVERAGE_UPDATE_TIME = config['scheduler']['coverage_update_time']
 
+# max seconds to wait for the evaluator before comparing bitmaps
+EVALUATION_WAIT = config['scheduler'].get('evaluation_wait', 30)
+
 FUZZERS: Fuzzers = []
 
 TARGET: str
@@ -402,12 +405,13 @@ def do_sync(fuzzers: Fuzzers, host_root_dir: Path) -> bool:
 
 def update_fuzzer_log(fuzzers):
     global LOG
-    new_log_entry = maybe_get_fuzzer_info(fuzzers)
+    new_log_entry = maybe_get_fuzzer_log_entry(fuzzers)
     if not new_log_entry: return
-    new_log_entry = compress_fuzzer_info(fuzzers, new_log_entry)
     new_log_entry['timestamp'] = time.time()
     # NOTE: don't copy twice
     append_log('log', new_log_entry, do_copy=False)
+    if IS_PROFILE:
+        logger.info(f'fuzzer_info cache: {coverage.get_cache_stats()}')
 
 
 def thread_update_fuzzer_log(fuzzers):
@@ -417,6 +421,41 @@ def thread_update_fuzzer_log(fuzzers):
         time.sleep(update_time)
 
 
+def maybe_get_fuzzer_log_entry(fuzzers) -> Optional[Coverage]:
+    '''
+    same as compress_fuzzer_info(maybe_get_fuzzer_info()) but only reads the
+    counts published by the evaluator, no bitmap is loaded
+    '''
+    summary = coverage.get_summary(OUTPUT)
+    if summary is None: return None
+    new_log_entry = nested_dict()
+    for fuzzer in fuzzers:
+        result = coverage.get_summary_fuzzer(summary, fuzzer)
+        if result is None:
+            logger.debug(f'get_fuzzer_log_entry: {fuzzer}\'s cov is None')
+            return None
+        # FIXME: same as coverage.thread_run_fuzzer
+        new_log_entry['coverage'][fuzzer] = {"line": 0, "line_coverage": 0}
+        new_log_entry['unique_bugs'][fuzzer] = result['unique_bugs']
+        new_log_entry['bitmap'][fuzzer] = result['bitmap']
+
+    global_result = coverage.get_summary_fuzzer(summary, 'global')
+    if global_result is None: return None
+    cov = coverage.get_coverage_global(OUTPUT)
+    if not cov:
+        cov = {"line": 0, "line_coverage": 0}
+    new_log_entry['global_coverage'] = cov
+    new_log_entry['global_unique_bugs'] = global_result['unique_bugs']
+    new_log_entry['global_bitmap'] = global_result['bitmap']
+    # health of the evaluator workers, restarts included
+    if 'evaluator' in summary:
+        new_log_entry['evaluator'] = summary['evaluator']
+    # edges each fuzzer found before anybody else
+    if 'first_found' in summary:
+        new_log_entry['first_found'] = summary['first_found']
+    return new_log_entry
+
+
 def maybe_get_fuzzer_info(fuzzers) -> Optional[Coverage]:
     logger.debug('get_fuzzer_info called')
 
@@ -459,6 +498,7 @@ def maybe_get_fuzzer_info(fuzzers) -> Optional[Coverage]:
     new_fuzzer_info['global_coverage'] = cov
     new_fuzzer_info['global_unique_bugs'] = unique_bugs
     new_fuzzer_info['global_bitmap'] = bitmap
+    new_fuzzer_info['edge_index'] = coverage.get_edge_index()
     logger.debug(f'global has line_coverge {cov["line"]}, bugs {unique_bugs}')
 
     return new_fuzzer_info
@@ -504,6 +544,7 @@ def get_fuzzer_info(fuzzers) -> Coverage:
     new_fuzzer_info['global_coverage'] = cov
     new_fuzzer_info['global_unique_bugs'] = unique_bugs
     new_fuzzer_info['global_bitmap'] = bitmap
+    new_fuzzer_info['edge_index'] = coverage.get_edge_index()
     logger.debug(f'global has line_coverge {cov["line"]}, bugs {unique_bugs}')
 
     return new_fuzzer_info
@@ -553,6 +594,8 @@ def compress_fuzzer_info(fuzzers, fuzzer_info):
         fuzzer_info['global_bitmap'] = global_count
         del global_bitmap
 
+    fuzzer_info.pop('edge_index', None)
+
     return fuzzer_info
 
 
@@ -605,13 +648,12 @@ def update_fuzzer_limit(fuzzer, new_cpu):
           empty_seed=ARGS.empty_seed)
 
 
-def fuzzer_bitmap_diff(fuzzers, before_fuzzer_info, after_fuzzer_info):
-    before_global_bitmap = before_fuzzer_info['global_bitmap']
-    after_bitmap = after_fuzzer_info['bitmap']
-    bitmap_diff = {}
-    for fuzzer in fuzzers:
-        bitmap_diff[fuzzer] = after_bitmap[fuzzer] - before_global_bitmap
-    return bitmap_diff
+def fuzzer_bitmap_diff_count(fuzzers, edge_index, epoch):
+    '''
+    # of edges each fuzzer has that were not in the global bitmap when epoch
+    started
+    '''
+    return edge_index.new_since_count(fuzzers, epoch)
 
 
 class SchedulingAlgorithm(metaclass=SingletonABCMeta):
@@ -658,6 +700,10 @@ class Schedule_Base(SchedulingAlgorithm):
         self.cov_before_prep: Coverage
         self.cov_before_focus: Coverage
 
+        # epoch of the evaluator edge index when the round started, edges
+        # found since then have first_epoch >= round_epoch
+        self.round_epoch = 0
+
         self.bitmap_contribution: BitmapContribution = {}
         self.all_bitmap_contribution: BitmapContribution = {}  # will not reset
         self.round_bitmap_contribution: Deque[BitmapContribution] = deque()
@@ -673,7 +719,16 @@ class Schedule_Base(SchedulingAlgorithm):
         self.diff_threshold_base = None
         self.diff_threshold_round = None
 
+    def wait_evaluated(self, fuzzers):
+        '''
+        a fuzzer whose test cases are not evaluated yet looks unproductive,
+        wait for the evaluator before comparing bitmaps
+        '''
+        if not coverage.wait_evaluated(fuzzers, timeout=EVALUATION_WAIT):
+            logger.warning(f'evaluator is behind, lag: {coverage.get_lag()}')
+
     def find_new_bitmap(self):
+        self.wait_evaluated(self.fuzzers)
         cov_before = self.cov_before_focus
         global_bm_before = cov_before['global_bitmap']
         cov_now = get_fuzzer_info(self.fuzzers)
@@ -737,16 +792,16 @@ class Schedule_Base(SchedulingAlgorithm):
         assert self.diff_threshold is not None
 
         ret = False
-        current_fuzzer_info = get_fuzzer_info(self.fuzzers)
-        global_bitmap = current_fuzzer_info['global_bitmap'].count()
-        bitmap_diff = fuzzer_bitmap_diff(self.fuzzers,
-                                         self.before_prep_fuzzer_info,
-                                         current_fuzzer_info)
+        self.wait_evaluated(self.fuzzers)
+        edge_index = coverage.get_edge_index()
+        assert edge_index
+        bitmap_diff = fuzzer_bitmap_diff_count(self.fuzzers, edge_index,
+                                               self.round_epoch)
         minv = 2**32
         maxv = 0
         for fuzzer in self.fuzzers:
-            minv = min(minv, bitmap_diff[fuzzer].count())
-            maxv = max(maxv, bitmap_diff[fuzzer].count())
+            minv = min(minv, bitmap_diff[fuzzer])
+            maxv = max(maxv, bitmap_diff[fuzzer])
         diff = maxv - minv
         # NOTE: threshold to determine whether we find a large difference
         self.diff_round = diff
@@ -764,6 +819,9 @@ class Schedule_Base(SchedulingAlgorithm):
             '''
             run_time = min(remain_time, 30)
             for prep in self.prep_fuzzers:
+                # NOTE: only the running one, the others don't produce test
+                # cases meanwhile
+                coverage.set_priority([prep])
                 self.run_one(prep)
                 self.prep_wait(run_time)
             self.dynamic_prep_time_round += run_time
@@ -780,6 +838,8 @@ class Schedule_Base(SchedulingAlgorithm):
     def prep_parallel(self) -> bool:
         logger.debug('prep parallel unfixed prep')
         prep_time = self.prep_time
+        # has_winner reads their bitmaps
+        coverage.set_priority(self.prep_fuzzers)
 
         for fuzzer in FUZZERS:
             num_prep = len(self.prep_fuzzers)
@@ -830,6 +890,7 @@ class Schedule_Base(SchedulingAlgorithm):
         logger.debug(f"cpu_assign: {new_cpu_assign}")
         logger.debug(f"sorted_cpu_assign: {sorted_cpu_assign}")
         logger.debug(f"focus_fuzzer_time: {focus_fuzzer_cpu_time}")
+        coverage.set_priority(run_fuzzers)
         for fuzzer in run_fuzzers:
             t = focus_fuzzer_cpu_time[fuzzer]
             logger.debug(f"focus_cpu_assign: {fuzzer}, time: {t}")
@@ -845,6 +906,7 @@ class Schedule_Base(SchedulingAlgorithm):
                                   focus_time: int) -> bool:
         global OUTPUT, FUZZERS, JOBS
         logger.debug('focus parallel')
+        coverage.set_priority(list(new_cpu_assign))
         for fuzzer, new_cpu in new_cpu_assign.items():
             update_fuzzer_limit(fuzzer, new_cpu)
         for fuzzer in FUZZERS:
@@ -855,6 +917,7 @@ class Schedule_Base(SchedulingAlgorithm):
 
     def focus_one(self, focus_fuzzer):
         assert focus_fuzzer in self.fuzzers
+        coverage.set_priority([focus_fuzzer])
         for fuzzer in self.fuzzers:
             new_cpu = JOBS if fuzzer == focus_fuzzer else 0
             update_fuzzer_limit(fuzzer, new_cpu)
@@ -864,23 +927,38 @@ class Schedule_Base(SchedulingAlgorithm):
         intersection = Bitmap.full()
         for fuzzer in fuzzers:
             bm = bitmaps[fuzzer]
-            intersection &= bm
+            intersection.intersection_update(bm)
         return intersection
 
+    def get_fuzzer_info_edge_index(self, fuzzers, fuzzer_info):
+        edge_index = fuzzer_info.get('edge_index')
+        if edge_index is None or not edge_index.has_fuzzers(fuzzers):
+            return None
+        return edge_index
+
     def get_fuzzer_info_bitmap_intersection(self, fuzzers, fuzzer_info):
+        edge_index = self.get_fuzzer_info_edge_index(fuzzers, fuzzer_info)
+        if edge_index is not None:
+            return edge_index.intersection(fuzzers)
         return self.get_bitmap_intersection(fuzzers, fuzzer_info['bitmap'])
 
     def get_bitmap_union(self, fuzzers, bitmaps):
         union = Bitmap.empty()
         for fuzzer in fuzzers:
             bm = bitmaps[fuzzer]
-            union |= bm
+            union.update(bm)
         return union
 
     def get_fuzzer_info_bitmap_union(self, fuzzers, fuzzer_info):
+        edge_index = self.get_fuzzer_info_edge_index(fuzzers, fuzzer_info)
+        if edge_index is not None:
+            return edge_index.union(fuzzers)
         return self.get_bitmap_union(fuzzers, fuzzer_info['bitmap'])
 
     def get_bitmap_intersection_contribution(self, fuzzers, fuzzer_info):
+        edge_index = self.get_fuzzer_info_edge_index(fuzzers, fuzzer_info)
+        if edge_index is not None:
+            return edge_index.intersection_contribution(fuzzers)
         intersection = self.get_fuzzer_info_bitmap_intersection(
             fuzzers, fuzzer_info)
         contribution = {}
@@ -888,8 +966,24 @@ class Schedule_Base(SchedulingAlgorithm):
             contribution[fuzzer] = fuzzer_info['bitmap'][fuzzer] - intersection
         return contribution
 
+    def get_bitmap_intersection_contribution_count(self, fuzzers,
+                                                   fuzzer_info):
+        edge_index = self.get_fuzzer_info_edge_index(fuzzers, fuzzer_info)
+        if edge_index is not None:
+            return edge_index.intersection_contribution_count(fuzzers)
+        intersection = self.get_fuzzer_info_bitmap_intersection(
+            fuzzers, fuzzer_info)
+        contribution = {}
+        for fuzzer in fuzzers:
+            contribution[fuzzer] = fuzzer_info['bitmap'][fuzzer].delta_count(
+                intersection)
+        return contribution
+
     # NOTE: unused, an alternative way to calcualte contribution
     def get_bitmap_distinct_contribution(self, fuzzers, fuzzer_info):
+        edge_index = self.get_fuzzer_info_edge_index(fuzzers, fuzzer_info)
+        if edge_index is not None:
+            return edge_index.distinct_contribution(fuzzers)
         contribution = {}
         for fuzzer in fuzzers:
             filtered = fuzzers.copy()
@@ -903,13 +997,12 @@ class Schedule_Base(SchedulingAlgorithm):
         for fuzzer in self.fuzzers:
             self.bitmap_contribution[fuzzer] = Bitmap.empty()
 
-    def add_bitmap_prep_contribution(self, fuzzers, before_fuzzer_info,
-                                     after_fuzzer_info):
-        bitmap_diff = fuzzer_bitmap_diff(fuzzers, before_fuzzer_info,
-                                         after_fuzzer_info)
+    def add_bitmap_prep_contribution(self, fuzzers, epoch, after_fuzzer_info):
+        edge_index = after_fuzzer_info['edge_index']
         for fuzzer in fuzzers:
-            self.bitmap_contribution[fuzzer] += bitmap_diff[fuzzer]
-            self.all_bitmap_contribution[fuzzer] += bitmap_diff[fuzzer]
+            new_bitmap = edge_index.new_since(fuzzer, epoch)
+            self.bitmap_contribution[fuzzer].update(new_bitmap)
+            self.all_bitmap_contribution[fuzzer].update(new_bitmap)
 
     def calculate_cpu_bitmap_intersection(self, fuzzers, fuzzer_info,
                                           focus_time):
@@ -918,11 +1011,8 @@ class Schedule_Base(SchedulingAlgorithm):
         cpu_threshold = 0
         # NOTE min focus_time to reduce unnecessary context switch
         focus_time_thrshold = 20
-        bitmap_contribution = self.get_bitmap_intersection_contribution(
+        contribution = self.get_bitmap_intersection_contribution_count(
             fuzzers, fuzzer_info)
-        contribution = {}
-        for fuzzer in fuzzers:
-            contribution[fuzzer] = bitmap_contribution[fuzzer].count()
         logger.debug(f'contribution {contribution}')
         # check all zero or not
         summation = sum(contribution.values())
@@ -1126,7 +1216,8 @@ class Schedule_Autofz(Schedule_Base):
         self.policy_bitmap = policy.BitmapPolicy()
         self.focused_round = []
         self.picked_times = {}
-        self.before_prep_fuzzer_info = empty_fuzzer_info(self.fuzzers)
+        self.before_prep_fuzzer_info = compress_fuzzer_info(
+            self.fuzzers, empty_fuzzer_info(self.fuzzers))
         self.find_new_round = False
 
         self.diff_threshold = diff_threshold
@@ -1165,10 +1256,16 @@ class Schedule_Autofz(Schedule_Base):
 
         global OUTPUT
         do_sync(self.fuzzers, OUTPUT)
+        # NOTE: only counts are kept for the log, new edges of this round
+        # are the ones found since round_epoch
         if self.first_round:
-            fuzzer_info = empty_fuzzer_info(self.fuzzers)
+            fuzzer_info = compress_fuzzer_info(self.fuzzers,
+                                               empty_fuzzer_info(self.fuzzers))
+            self.round_epoch = 0
         else:
-            fuzzer_info = get_fuzzer_info(self.fuzzers)
+            fuzzer_info = maybe_get_fuzzer_log_entry(self.fuzzers)
+            assert fuzzer_info
+            self.round_epoch = coverage.new_epoch()
         self.before_prep_fuzzer_info = fuzzer_info
         logger.debug(f'before_fuzzer_info: {self.before_prep_fuzzer_info}')
 
@@ -1187,11 +1284,10 @@ class Schedule_Autofz(Schedule_Base):
         after_prep_fuzzer_info = fuzzer_info
 
         logger.debug(f'after_fuzzer_info: {after_prep_fuzzer_info}')
-        bitmap_diff = fuzzer_bitmap_diff(self.fuzzers,
-                                         self.before_prep_fuzzer_info,
-                                         after_prep_fuzzer_info)
-        self.add_bitmap_prep_contribution(prep_fuzzers,
-                                          self.before_prep_fuzzer_info,
+        bitmap_diff = fuzzer_bitmap_diff_count(
+            self.fuzzers, after_prep_fuzzer_info['edge_index'],
+            self.round_epoch)
+        self.add_bitmap_prep_contribution(prep_fuzzers, self.round_epoch,
                                           after_prep_fuzzer_info)
 
         logger.debug(f'BITMAP_DIFF: {bitmap_diff}')
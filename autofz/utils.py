@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
+import contextlib
 import datetime
 import os
 import random
 import re
 import string
 import sys
+import threading
 
 # FIXME
 if __package__ is None:
@@ -108,6 +110,25 @@ def fuzzer_has_subdir(fuzzer: FuzzerType) -> bool:
     return False
 
 
+@contextlib.contextmanager
+def atomic_write(path, mode='w'):
+    '''
+    write to a temporary file next to path and rename it over path
+    readers only ever see the old or the new file, never a partial one
+    '''
+    path = str(path)
+    dirname, basename = os.path.split(path)
+    tmp_name = f'.{basename}.tmp.{os.getpid()}.{threading.get_ident()}'
+    tmp_path = os.path.join(dirname, tmp_name)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
 def get_random_string(N):
     return ''.join(
         random.choice(string.ascii_uppercase + string.digits)
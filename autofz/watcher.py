@@ -33,6 +33,42 @@ class WatcherException(Exception):
     pass
 
 
+# bumped whenever any watcher queues test cases, so that a consumer of all
+# the watchers can block until something new arrives
+TEST_CASE_COUNT = 0
+NEW_TEST_CASE = Condition()
+
+
+def notify_test_case() -> None:
+    global TEST_CASE_COUNT
+    with NEW_TEST_CASE:
+        TEST_CASE_COUNT += 1
+        NEW_TEST_CASE.notify_all()
+
+
+def get_test_case_count() -> int:
+    with NEW_TEST_CASE:
+        return TEST_CASE_COUNT
+
+
+def wait_test_case(count: int, timeout: Optional[float] = None) -> int:
+    '''
+    block until test cases are queued after get_test_case_count returned
+    count, or timeout; returns the current count
+    '''
+    with NEW_TEST_CASE:
+        NEW_TEST_CASE.wait_for(lambda: TEST_CASE_COUNT != count, timeout)
+        return TEST_CASE_COUNT
+
+
+def is_new_coverage(test_case_path: Path) -> bool:
+    '''
+    AFL family fuzzers tag the queue entries that cover new edges with +cov,
+    the other fuzzers never do
+    '''
+    return '+cov' in test_case_path.name
+
+
 class _NewTestCaseHandler(watchdog.events.FileSystemEventHandler):
     def __init__(
         self,
@@ -54,6 +90,7 @@ class _NewTestCaseHandler(watchdog.events.FileSystemEventHandler):
                     # logger.debug(f"Found new test case: {test_case_path}")
                     self._test_case_queue.append(test_case_path)
                     self._test_in_queue.notify()
+                    notify_test_case()
 
 
 class Watcher(ABC):
@@ -132,6 +169,7 @@ class Watcher(ABC):
             logger.debug("Scanning for existing test cases")
             self._scan_target_folders()
             self._test_in_queue.notify()
+            notify_test_case()
 
         # _test_in_queue is released and the observer start queuing the paths
         # accumulated during initialization